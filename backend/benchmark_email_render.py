@@ -0,0 +1,43 @@
+"""
+Render benchmark for order emails: compile-per-call vs the cached template environment.
+
+Usage: python benchmark_email_render.py [iterations]
+"""
+
+import sys
+import timeit
+from jinja2 import Template
+from email_service import TEMPLATES_DIR, email_service
+
+ORDER_DATA = {
+    "order_id": "6720f1c2a9b4e3d5f6a7b8c9",
+    "status": "confirmed",
+    "total_amount": 2499.0,
+    "items": [
+        {"name": f"Sample Product {i}", "quantity": 1 + i % 3, "price": 499.0 + i}
+        for i in range(5)
+    ],
+}
+
+
+def render_uncached():
+    source = (TEMPLATES_DIR / "order_confirmation.html").read_text()
+    return Template(source, autoescape=True).render(
+        order_id=ORDER_DATA["order_id"],
+        date="January 01, 2025",
+        status="Confirmed",
+        items=ORDER_DATA["items"],
+        total=ORDER_DATA["total_amount"],
+        support_email="support@skyriting.com",
+    )
+
+
+def render_cached():
+    return email_service.render_order_confirmation(ORDER_DATA)
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for label, func in [("compile per call", render_uncached), ("cached environment", render_cached)]:
+        seconds = timeit.timeit(func, number=iterations)
+        print(f"{label:<20} {seconds / iterations * 1e6:9.1f} µs/render  ({iterations / seconds:,.0f} renders/s)")
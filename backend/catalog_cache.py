@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi.encoders import jsonable_encoder
+
+
+class InMemoryCacheBackend:
+    """Per-process LRU with a TTL; the default catalog cache backend"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    async def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    async def delete_prefix(self, prefix: str):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Shared backend for any Redis-compatible server (requires the redis package)"""
+
+    def __init__(self, url: str, ttl: float, namespace: str = "catalog:"):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.ttl = ttl
+        self.namespace = namespace
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(self.namespace + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any):
+        await self.client.set(self.namespace + key, json.dumps(value), px=int(self.ttl * 1000))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*[self.namespace + key for key in keys])
+
+    async def delete_prefix(self, prefix: str):
+        keys = [key async for key in self.client.scan_iter(match=f"{self.namespace}{prefix}*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class CatalogCache:
+    """Read-through cache for catalog responses, invalidated by the admin write routes.
+
+    Every key with a load in flight has a generation that invalidation bumps;
+    a load that sees its key's generation change drops its result instead of
+    caching data read before the write.
+    """
+
+    def __init__(self, backend=None):
+        ttl = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", 300))
+        redis_url = os.getenv("CATALOG_CACHE_REDIS_URL")
+        if backend is None:
+            if redis_url:
+                backend = RedisCacheBackend(redis_url, ttl)
+            else:
+                backend = InMemoryCacheBackend(int(os.getenv("CATALOG_CACHE_MAX_SIZE", 1000)), ttl)
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        # key -> [generation, loads in flight]; only keys being loaded are tracked
+        self._loads: Dict[str, list] = {}
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached response for key, computing and storing it on a miss"""
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        load = self._loads.setdefault(key, [0, 0])
+        generation = load[0]
+        load[1] += 1
+        try:
+            value = await loader()
+            if value is not None and load[0] == generation:
+                # Store the JSON-ready form so every backend holds the same thing
+                value = jsonable_encoder(value)
+                await self.backend.set(key, value)
+                if load[0] != generation:
+                    # Invalidated while storing; its delete may have run before our set
+                    await self.backend.delete(key)
+        finally:
+            load[1] -= 1
+            if not load[1]:
+                del self._loads[key]
+        return value
+
+    async def invalidate(self, *keys: str):
+        for key in keys:
+            if key in self._loads:
+                self._loads[key][0] += 1
+        await self.backend.delete(*keys)
+
+    async def invalidate_prefix(self, prefix: str):
+        for key, load in self._loads.items():
+            if key.startswith(prefix):
+                load[0] += 1
+        await self.backend.delete_prefix(prefix)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "size": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+        }
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,241 @@
+"""
+Per-day analytics rollups in the ``daily_stats`` collection.
+
+One small document per UTC day, keyed by its ``YYYY-MM-DD`` date:
+
+    revenue            sum of total_amount for paid orders placed that day
+    orders             orders placed that day
+    orders_by_status   current status of the orders placed that day
+    signups            users registered that day
+    influencers        net influencer verifications (verified minus removed)
+
+The request handlers and setup_data.py keep the rollups current with
+``$inc`` upserts. When the collection is empty (e.g. on first deploy) the
+server rebuilds it from ``orders`` and ``users`` at startup; run
+``python daily_stats.py`` to repair drift from data written some other way.
+A rebuild only rewrites days before the start of the current UTC day, so
+today's document keeps every live increment.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("day", "week", "month")
+
+
+def day_key(at: datetime) -> str:
+    return at.strftime("%Y-%m-%d")
+
+
+def naive_utc(at: Optional[datetime]) -> Optional[datetime]:
+    """Rollup dates are naive UTC; convert timezone-aware query parameters to match"""
+    if at is not None and at.tzinfo is not None:
+        return at.astimezone(timezone.utc).replace(tzinfo=None)
+    return at
+
+
+def period_key(day: datetime, granularity: str) -> str:
+    if granularity == "month":
+        return day.strftime("%Y-%m")
+    if granularity == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return day_key(day)
+
+
+class DailyStats:
+    """Incrementally maintained daily rollups backing /admin/analytics"""
+
+    def __init__(self):
+        self.stats = None
+        self._task = None
+
+    def start(self, db):
+        self.stats = db.daily_stats
+        self._task = asyncio.create_task(self._backfill_if_empty(db))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _backfill_if_empty(self, db):
+        try:
+            if await self.stats.find_one({}, {"_id": 1}) is None:
+                # Nothing has been counted live yet, so today is rebuilt too, up to now
+                days = await backfill(db, datetime.utcnow())
+                logger.info(f"daily_stats was empty; rebuilt {days} days from orders and users")
+        except Exception as e:
+            logger.error(f"daily_stats backfill failed: {e}")
+
+    async def _inc(self, at: datetime, increments: dict):
+        # Rollups are best effort: a failed increment must never fail the request
+        try:
+            day = datetime(at.year, at.month, at.day)
+            await self.stats.update_one(
+                {"_id": day_key(day)},
+                {"$inc": increments, "$setOnInsert": {"date": day}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"daily_stats update failed: {e}")
+
+    async def record_order(self, order: dict):
+        increments = {"orders": 1, f"orders_by_status.{order['status']}": 1}
+        if order.get("payment_status") == "completed":
+            increments["revenue"] = order.get("total_amount", 0)
+        await self._inc(order["created_at"], increments)
+
+    async def record_status_change(self, order: dict, new_status: str):
+        """order is the document before the update, with created_at and status"""
+        if order.get("status") == new_status:
+            return
+        await self._inc(order["created_at"], {
+            f"orders_by_status.{order.get('status')}": -1,
+            f"orders_by_status.{new_status}": 1
+        })
+
+    async def record_signup(self, at: datetime):
+        await self._inc(at, {"signups": 1})
+
+    async def record_influencer(self, at: datetime, delta: int):
+        await self._inc(at, {"influencers": delta})
+
+    async def _all_time(self) -> dict:
+        totals, statuses = await asyncio.gather(
+            self.stats.aggregate([{"$group": {
+                "_id": None,
+                "revenue": {"$sum": "$revenue"},
+                "orders": {"$sum": "$orders"},
+                "signups": {"$sum": "$signups"},
+                "influencers": {"$sum": "$influencers"}
+            }}]).to_list(1),
+            self.stats.aggregate([
+                {"$project": {"statuses": {"$objectToArray": "$orders_by_status"}}},
+                {"$unwind": "$statuses"},
+                {"$group": {"_id": "$statuses.k", "count": {"$sum": "$statuses.v"}}}
+            ]).to_list(None)
+        )
+        all_time = {"revenue": 0, "orders": 0, "signups": 0, "influencers": 0}
+        if totals:
+            all_time.update({key: totals[0][key] for key in all_time})
+        all_time["orders_by_status"] = {status["_id"]: status["count"] for status in statuses}
+        return all_time
+
+    async def _days(self, start: Optional[datetime], end: Optional[datetime]) -> list:
+        """Rollups for the days from start's day up to, not including, end; _id order is date order"""
+        query = {}
+        if start:
+            query["$gte"] = day_key(start)
+        if end:
+            # A day is in range when its midnight is before end
+            query["$lt" if end == datetime(end.year, end.month, end.day) else "$lte"] = day_key(end)
+        return await self.stats.find({"_id": query} if query else {}).sort("_id", 1).to_list(None)
+
+    async def summary(self, start: Optional[datetime] = None, end: Optional[datetime] = None, granularity: Optional[str] = None) -> dict:
+        """All-time totals, plus a ranged summary and per-period series when asked for"""
+        start, end = naive_utc(start), naive_utc(end)
+        if start or end or granularity:
+            all_time, days = await asyncio.gather(self._all_time(), self._days(start, end))
+        else:
+            all_time, days = await self._all_time(), []
+
+        def add(total: dict, day: dict):
+            total["revenue"] += day.get("revenue", 0)
+            total["orders"] += day.get("orders", 0)
+            total["signups"] += day.get("signups", 0)
+            total["influencers"] += day.get("influencers", 0)
+            for order_status, count in (day.get("orders_by_status") or {}).items():
+                total["orders_by_status"][order_status] = total["orders_by_status"].get(order_status, 0) + count
+
+        def empty():
+            return {"revenue": 0, "orders": 0, "signups": 0, "influencers": 0, "orders_by_status": {}}
+
+        ranged, series = empty(), {}
+        for day in days:
+            add(ranged, day)
+            if granularity:
+                add(series.setdefault(period_key(day["date"], granularity), empty()), day)
+
+        for totals in [all_time, ranged, *series.values()]:
+            # Statuses every order has moved out of are left at 0 by the $inc pairs
+            totals["orders_by_status"] = {key: count for key, count in totals["orders_by_status"].items() if count}
+
+        result = {"all_time": all_time}
+        if start or end:
+            result["range"] = ranged
+        if granularity:
+            result["series"] = [{"period": period, **totals} for period, totals in series.items()]
+        return result
+
+
+async def backfill(db, cutoff: Optional[datetime] = None) -> int:
+    """Rebuild the daily_stats documents for days before cutoff from orders and users.
+
+    cutoff defaults to the start of the current UTC day. Days from cutoff on
+    are left to the live ``$inc`` path, and earlier days are overwritten in
+    place, so readers never see the collection empty.
+    """
+    if cutoff is None:
+        now = datetime.utcnow()
+        cutoff = datetime(now.year, now.month, now.day)
+    days = {}
+
+    def bucket(at: datetime) -> dict:
+        day = datetime(at.year, at.month, at.day)
+        return days.setdefault(day_key(day), {
+            "date": day, "revenue": 0, "orders": 0, "orders_by_status": {}, "signups": 0, "influencers": 0
+        })
+
+    async for order in db.orders.find({"created_at": {"$ne": None, "$lt": cutoff}}, {"created_at": 1, "status": 1, "payment_status": 1, "total_amount": 1}):
+        day = bucket(order["created_at"])
+        day["orders"] += 1
+        order_status = order.get("status", "pending")
+        day["orders_by_status"][order_status] = day["orders_by_status"].get(order_status, 0) + 1
+        if order.get("payment_status") == "completed":
+            day["revenue"] += order.get("total_amount", 0)
+
+    async for user in db.users.find({"created_at": {"$ne": None, "$lt": cutoff}}, {"created_at": 1, "is_verified": 1, "verified_at": 1}):
+        bucket(user["created_at"])["signups"] += 1
+        # Users verified before verified_at was recorded count on their signup day
+        verified_at = user.get("verified_at") or user["created_at"]
+        if user.get("is_verified") and verified_at < cutoff:
+            bucket(verified_at)["influencers"] += 1
+
+    # Earlier days with nothing left in them
+    await db.daily_stats.delete_many({"_id": {"$lt": day_key(cutoff), "$nin": list(days)}})
+    if days:
+        await db.daily_stats.bulk_write([
+            UpdateOne({"_id": key}, {"$set": day}, upsert=True) for key, day in days.items()
+        ])
+    return len(days)
+
+daily_stats = DailyStats()
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tlsAllowInvalidCertificates=True)
+    db = client[os.environ['DB_NAME']]
+
+    print("Rebuilding daily_stats from orders and users...")
+    count = await backfill(db)
+    print(f"✓ {count} days written")
+
+    client.close()
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,97 @@
+import os
+from datetime import datetime
+from email_service import email_service
+from leased_jobs import LeasedJobQueue
+
+
+class EmailOutbox(LeasedJobQueue):
+    """Durable queue of transactional emails drained by background workers.
+
+    Messages are persisted in the ``email_outbox`` collection before the request
+    returns; workers claim them with a lease so a crashed process's messages are
+    picked up again once the lease expires.
+    """
+
+    name = "Email"
+    pending_status = "pending"
+    running_status = "sending"
+    error_field = "last_error"
+    claim_sort = [("next_attempt_at", 1)]
+
+    def __init__(self):
+        super().__init__("EMAIL_OUTBOX", max_attempts=6, workers=2)
+        self.batch_size = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", 20))
+        self.renderers = {
+            "order_confirmation": email_service.render_order_confirmation,
+            "order_status_update": email_service.render_order_status_update,
+        }
+
+    async def enqueue(self, kind: str, payload: dict, to_email: str) -> str:
+        now = datetime.utcnow()
+        result = await self.collection.insert_one({
+            "kind": kind,
+            "payload": payload,
+            "to": to_email,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "last_error": None,
+            "created_at": now,
+            "updated_at": now
+        })
+        self.wake()
+        return str(result.inserted_id)
+
+    async def run_once(self) -> bool:
+        batch = []
+        while len(batch) < self.batch_size:
+            message = await self.claim()
+            if not message:
+                break
+            batch.append(message)
+        if batch:
+            await self._deliver(batch)
+        return bool(batch)
+
+    async def _deliver(self, batch: list):
+        """Render every claimed message and send them together over one SMTP session"""
+        errors = {}
+        rendered = []
+        for message in batch:
+            renderer = self.renderers.get(message["kind"])
+            try:
+                if renderer is None:
+                    raise ValueError(f"Unknown email kind: {message['kind']}")
+                subject, html_content = renderer(message["payload"])
+                rendered.append((message, (message["to"], subject, html_content)))
+            except Exception as e:
+                errors[message["_id"]] = str(e)
+
+        if rendered:
+            results = await email_service.send_many([outgoing for _, outgoing in rendered])
+            for (message, _), sent in zip(rendered, results):
+                if not sent:
+                    errors[message["_id"]] = "SMTP delivery failed"
+
+        for message in batch:
+            error = errors.get(message["_id"])
+            if error is None:
+                now = datetime.utcnow()
+                await self.collection.update_one(
+                    {"_id": message["_id"]},
+                    {"$set": {"status": "sent", "sent_at": now, "updated_at": now}, "$unset": {"locked_until": ""}}
+                )
+            else:
+                await self.fail(message, error)
+
+    def start(self, db):
+        self.start_workers(db.email_outbox)
+
+    async def stats(self) -> dict:
+        counts = await self.collection.aggregate([
+            {"$match": {"status": {"$in": ["pending", "sending", "failed"]}}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        return {row["_id"]: row["count"] for row in counts}
+
+email_outbox = EmailOutbox()
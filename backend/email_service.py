@@ -1,92 +1,132 @@
 import aiosmtplib
+import asyncio
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from jinja2 import Template
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
 import os
+import time
 from datetime import datetime
+from pathlib import Path
+from typing import List, Tuple
+
+TEMPLATES_DIR = Path(__file__).parent / "templates" / "emails"
+TEMPLATE_NAMES = ["order_confirmation.html", "order_status_update.html"]
+
+def create_template_environment() -> Environment:
+    """Jinja2 environment for email templates, with an optional on-disk bytecode cache"""
+    bytecode_dir = os.getenv("EMAIL_TEMPLATE_BYTECODE_CACHE")
+    if bytecode_dir:
+        os.makedirs(bytecode_dir, exist_ok=True)
+    return Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=select_autoescape(["html"]),
+        bytecode_cache=FileSystemBytecodeCache(bytecode_dir) if bytecode_dir else None,
+        auto_reload=False,
+    )
 
 class EmailService:
     def __init__(self):
-        self.smtp_host = "smtp.gmail.com"
-        self.smtp_port = 587
+        self.smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
+        self.smtp_port = int(os.getenv("SMTP_PORT", 587))
+        self.smtp_start_tls = os.getenv("SMTP_START_TLS", "true").lower() == "true"
         self.sender_email = os.getenv("GMAIL_USER")
         self.sender_password = os.getenv("GMAIL_REFRESH_TOKEN")  # Using refresh token as password
+        # Authenticated SMTP sessions are pooled and reused until idle for too long
+        self.pool_size = int(os.getenv("SMTP_POOL_SIZE", 3))
+        self.idle_timeout = float(os.getenv("SMTP_IDLE_TIMEOUT_SECONDS", 60))
+        self._idle = []
+        self._slots = asyncio.Semaphore(self.pool_size)
+        # Templates are parsed and compiled once; rendering is just filling in the context
+        self.template_env = create_template_environment()
+        self.templates = {name: self.template_env.get_template(name) for name in TEMPLATE_NAMES}
+    
+    def _build_message(self, to_email: str, subject: str, html_content: str) -> MIMEMultipart:
+        message = MIMEMultipart("alternative")
+        message["From"] = self.sender_email
+        message["To"] = to_email
+        message["Subject"] = subject
         
-    async def send_email(self, to_email: str, subject: str, html_content: str):
-        """Send email using Gmail SMTP"""
+        html_part = MIMEText(html_content, "html")
+        message.attach(html_part)
+        return message
+    
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.smtp_host,
+            port=self.smtp_port,
+            start_tls=self.smtp_start_tls,
+            username=self.sender_email if self.sender_password else None,
+            password=self.sender_password,
+        )
+        await smtp.connect()
+        return smtp
+    
+    async def _acquire(self) -> aiosmtplib.SMTP:
+        await self._slots.acquire()
         try:
-            message = MIMEMultipart("alternative")
-            message["From"] = self.sender_email
-            message["To"] = to_email
-            message["Subject"] = subject
-            
-            html_part = MIMEText(html_content, "html")
-            message.attach(html_part)
-            
-            await aiosmtplib.send(
-                message,
-                hostname=self.smtp_host,
-                port=self.smtp_port,
-                start_tls=True,
-                username=self.sender_email,
-                password=self.sender_password,
-            )
-            return True
+            while self._idle:
+                smtp, last_used = self._idle.pop()
+                if smtp.is_connected and time.monotonic() - last_used < self.idle_timeout:
+                    return smtp
+                await self._quit(smtp)
+            return await self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+    
+    def _release(self, smtp: aiosmtplib.SMTP):
+        if smtp.is_connected:
+            self._idle.append((smtp, time.monotonic()))
+        self._slots.release()
+    
+    async def _quit(self, smtp: aiosmtplib.SMTP):
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except Exception:
+            smtp.close()
+    
+    async def send_many(self, messages: List[Tuple[str, str, str]]) -> List[bool]:
+        """Send (to_email, subject, html_content) messages over one pooled SMTP session"""
+        try:
+            smtp = await self._acquire()
         except Exception as e:
             print(f"Email sending failed: {e}")
-            return False
-    
-    async def send_order_confirmation(self, order_data: dict, user_email: str):
-        """Send order confirmation email with invoice"""
-        template = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
-                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
-                .header { background: #000; color: #fff; padding: 20px; text-align: center; }
-                .order-details { background: #f9f9f9; padding: 20px; margin: 20px 0; }
-                .item { border-bottom: 1px solid #ddd; padding: 10px 0; }
-                .total { font-size: 20px; font-weight: bold; color: #4CAF50; }
-                .footer { text-align: center; color: #666; margin-top: 30px; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>SKYRITING</h1>
-                    <p>Order Confirmation</p>
-                </div>
-                
-                <p>Thank you for your order!</p>
-                
-                <div class="order-details">
-                    <h2>Order #{{ order_id }}</h2>
-                    <p><strong>Date:</strong> {{ date }}</p>
-                    <p><strong>Status:</strong> {{ status }}</p>
-                    
-                    <h3>Items:</h3>
-                    {% for item in items %}
-                    <div class="item">
-                        <p><strong>{{ item.name }}</strong></p>
-                        <p>Quantity: {{ item.quantity }} × ${{ item.price }}</p>
-                    </div>
-                    {% endfor %}
-                    
-                    <p class="total">Total: ${{ total }}</p>
-                </div>
-                
-                <div class="footer">
-                    <p>Questions? Contact us at {{ support_email }}</p>
-                    <p>© 2025 Skyriting. All rights reserved.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+            return [False] * len(messages)
         
-        html_content = Template(template).render(
+        results = []
+        try:
+            for to_email, subject, html_content in messages:
+                message = self._build_message(to_email, subject, html_content)
+                try:
+                    try:
+                        await smtp.send_message(message)
+                    except aiosmtplib.SMTPServerDisconnected:
+                        # Pooled session was dropped by the server; reconnect once
+                        smtp.close()
+                        smtp = await self._connect()
+                        await smtp.send_message(message)
+                    results.append(True)
+                except Exception as e:
+                    print(f"Email sending failed: {e}")
+                    results.append(False)
+        finally:
+            self._release(smtp)
+        return results
+    
+    async def send_email(self, to_email: str, subject: str, html_content: str):
+        """Send email using Gmail SMTP"""
+        results = await self.send_many([(to_email, subject, html_content)])
+        return results[0]
+    
+    async def close(self):
+        while self._idle:
+            smtp, _ = self._idle.pop()
+            await self._quit(smtp)
+    
+    def render_order_confirmation(self, order_data: dict) -> Tuple[str, str]:
+        """Render order confirmation email with invoice, returning (subject, html)"""
+        html_content = self.templates["order_confirmation.html"].render(
             order_id=order_data.get("order_id", "N/A"),
             date=datetime.now().strftime("%B %d, %Y"),
             status=order_data.get("status", "pending").capitalize(),
@@ -95,44 +135,15 @@ class EmailService:
             support_email=self.sender_email
         )
         
-        return await self.send_email(
-            user_email,
-            f"Order Confirmation - #{order_data.get('order_id', 'N/A')}",
-            html_content
-        )
+        return f"Order Confirmation - #{order_data.get('order_id', 'N/A')}", html_content
     
-    async def send_order_status_update(self, order_data: dict, user_email: str):
-        """Send order status update email"""
-        template = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
-                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
-                .header { background: #000; color: #fff; padding: 20px; text-align: center; }
-                .status-update { background: #f0f8ff; padding: 20px; margin: 20px 0; border-left: 4px solid #4CAF50; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>SKYRITING</h1>
-                    <p>Order Update</p>
-                </div>
-                
-                <div class="status-update">
-                    <h2>Order #{{ order_id }}</h2>
-                    <p><strong>New Status:</strong> {{ status }}</p>
-                    <p>{{ message }}</p>
-                </div>
-                
-                <p>Thank you for shopping with Skyriting!</p>
-            </div>
-        </body>
-        </html>
-        """
-        
+    async def send_order_confirmation(self, order_data: dict, user_email: str):
+        """Send order confirmation email with invoice"""
+        subject, html_content = self.render_order_confirmation(order_data)
+        return await self.send_email(user_email, subject, html_content)
+    
+    def render_order_status_update(self, order_data: dict) -> Tuple[str, str]:
+        """Render order status update email, returning (subject, html)"""
         status_messages = {
             "confirmed": "Your order has been confirmed and is being prepared.",
             "shipped": "Great news! Your order has been shipped and is on the way.",
@@ -140,16 +151,17 @@ class EmailService:
             "cancelled": "Your order has been cancelled as requested."
         }
         
-        html_content = Template(template).render(
+        html_content = self.templates["order_status_update.html"].render(
             order_id=order_data.get("order_id", "N/A"),
             status=order_data.get("status", "pending").capitalize(),
             message=status_messages.get(order_data.get("status"), "Your order status has been updated.")
         )
         
-        return await self.send_email(
-            user_email,
-            f"Order #{order_data.get('order_id')} - Status Update",
-            html_content
-        )
+        return f"Order #{order_data.get('order_id')} - Status Update", html_content
+    
+    async def send_order_status_update(self, order_data: dict, user_email: str):
+        """Send order status update email"""
+        subject, html_content = self.render_order_status_update(order_data)
+        return await self.send_email(user_email, subject, html_content)
 
 email_service = EmailService()
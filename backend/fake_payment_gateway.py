@@ -0,0 +1,40 @@
+"""
+Local stand-in for the Razorpay orders API.
+
+Run with:  uvicorn fake_payment_gateway:app --port 9100
+and start the API with RAZORPAY_API_URL=http://localhost:9100/v1
+
+FAKE_GATEWAY_DELAY_SECONDS adds latency to every call and
+FAKE_GATEWAY_FAIL_RATE (0-1) makes that fraction of calls return 502,
+which is enough to exercise timeouts and the circuit breaker.
+"""
+
+import asyncio
+import os
+import random
+import time
+import uuid
+from fastapi import FastAPI, Body, HTTPException
+
+app = FastAPI(title="Fake Razorpay")
+
+
+@app.post("/v1/orders")
+async def create_order(payload: dict = Body(...)):
+    await asyncio.sleep(float(os.getenv("FAKE_GATEWAY_DELAY_SECONDS", 0)))
+    if random.random() < float(os.getenv("FAKE_GATEWAY_FAIL_RATE", 0)):
+        raise HTTPException(status_code=502, detail="Simulated gateway failure")
+    if not isinstance(payload.get("amount"), int) or payload["amount"] < 100:
+        raise HTTPException(status_code=400, detail="The amount must be at least INR 1.00")
+
+    return {
+        "id": f"order_{uuid.uuid4().hex[:14]}",
+        "entity": "order",
+        "amount": payload["amount"],
+        "amount_paid": 0,
+        "amount_due": payload["amount"],
+        "currency": payload.get("currency", "INR"),
+        "status": "created",
+        "attempts": 0,
+        "created_at": int(time.time())
+    }
@@ -0,0 +1,56 @@
+"""
+Local stand-in for the Expo push API.
+
+Run with:  uvicorn fake_push_service:app --port 9200
+and start the API with EXPO_PUSH_URL=http://localhost:9200/--/api/v2/push/send
+
+Tokens containing "invalid" are answered with a DeviceNotRegistered error ticket,
+tokens containing "stale" get an ok ticket whose receipt reports DeviceNotRegistered.
+FAKE_PUSH_DELAY_SECONDS adds latency to every request.
+"""
+
+import asyncio
+import os
+import uuid
+from typing import List
+from fastapi import FastAPI, Body, HTTPException
+
+app = FastAPI(title="Fake Expo Push")
+stale_tickets = {}
+
+
+@app.post("/--/api/v2/push/send")
+async def send(messages: List[dict] = Body(...)):
+    await asyncio.sleep(float(os.getenv("FAKE_PUSH_DELAY_SECONDS", 0)))
+    if len(messages) > 100:
+        raise HTTPException(status_code=400, detail="PUSH_TOO_MANY_NOTIFICATIONS")
+
+    data = []
+    for message in messages:
+        if "invalid" in message.get("to", ""):
+            data.append({
+                "status": "error",
+                "message": f"\"{message['to']}\" is not a registered push notification recipient",
+                "details": {"error": "DeviceNotRegistered"}
+            })
+        else:
+            ticket_id = str(uuid.uuid4())
+            if "stale" in message.get("to", ""):
+                stale_tickets[ticket_id] = message["to"]
+            data.append({"status": "ok", "id": ticket_id})
+    return {"data": data}
+
+
+@app.post("/--/api/v2/push/getReceipts")
+async def get_receipts(payload: dict = Body(...)):
+    receipts = {}
+    for ticket_id in payload.get("ids", []):
+        if ticket_id in stale_tickets:
+            receipts[ticket_id] = {
+                "status": "error",
+                "message": f"\"{stale_tickets[ticket_id]}\" is not a registered push notification recipient",
+                "details": {"error": "DeviceNotRegistered"}
+            }
+        else:
+            receipts[ticket_id] = {"status": "ok"}
+    return {"data": receipts}
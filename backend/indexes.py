@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Declarative index registry. Each entry lists the endpoint queries it serves so
+# the coverage report stays in sync with what is actually created.
+INDEXES = [
+    {
+        "collection": "users",
+        "keys": [("email", ASCENDING)],
+        "options": {"name": "email_unique", "unique": True},
+        "queries": ["POST /auth/register", "POST /auth/login"],
+    },
+    {
+        "collection": "users",
+        "keys": [("created_at", DESCENDING), ("_id", DESCENDING)],
+        "options": {"name": "created_at_id"},
+        "queries": ["GET /admin/users"],
+    },
+    {
+        "collection": "users",
+        "keys": [("expo_push_token", ASCENDING)],
+        "options": {"name": "expo_push_token", "sparse": True},
+        "queries": ["POST /admin/notifications/send", "GET /admin/notifications/stats"],
+    },
+    {
+        "collection": "products",
+        "keys": [("is_active", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        "options": {"name": "active_created_at"},
+        "queries": ["GET /products", "GET /products/trending", "GET /products/new-arrivals", "GET /admin/analytics"],
+    },
+    {
+        "collection": "products",
+        "keys": [("is_active", ASCENDING), ("category", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        "options": {"name": "active_category_created_at"},
+        "queries": ["GET /products?category="],
+    },
+    {
+        "collection": "products",
+        "keys": [("is_active", ASCENDING), ("brand_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        "options": {"name": "active_brand_created_at"},
+        "queries": ["GET /products?brand_id="],
+    },
+    {
+        "collection": "products",
+        "keys": [("is_active", ASCENDING), ("gender", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        "options": {"name": "active_gender_created_at"},
+        "queries": ["GET /products?gender="],
+    },
+    {
+        "collection": "products",
+        # Equality prefix keeps $text scans to active products; only one text index is allowed per collection
+        "keys": [("is_active", ASCENDING), ("name", TEXT), ("category", TEXT), ("description", TEXT)],
+        "options": {"name": "active_text", "weights": {"name": 10, "category": 5, "description": 1}},
+        "queries": ["GET /products/search"],
+    },
+    {
+        "collection": "brands",
+        "keys": [("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        "options": {"name": "status_created_at"},
+        "queries": ["GET /brands", "GET /admin/analytics"],
+    },
+    {
+        "collection": "posts",
+        "keys": [("created_at", DESCENDING), ("_id", DESCENDING)],
+        "options": {"name": "created_at_id"},
+        "queries": ["GET /posts/feed"],
+    },
+    {
+        "collection": "follows",
+        "keys": [("follower_id", ASCENDING), ("followee_id", ASCENDING)],
+        "options": {"name": "follower_followee_unique", "unique": True},
+        "queries": ["POST /users/follow/{id}", "POST /users/unfollow/{id}"],
+    },
+    {
+        "collection": "follows",
+        "keys": [("followee_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        "options": {"name": "followee_created_at_id"},
+        "queries": ["GET /users/{id}/followers"],
+    },
+    {
+        "collection": "follows",
+        "keys": [("followee_id", ASCENDING), ("follower_id", ASCENDING)],
+        "options": {"name": "followee_follower"},
+        "queries": ["timeline fan-out worker"],
+    },
+    {
+        "collection": "follows",
+        "keys": [("follower_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        "options": {"name": "follower_created_at_id"},
+        "queries": ["GET /users/{id}/following"],
+    },
+    {
+        "collection": "posts",
+        "keys": [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        "options": {"name": "user_created_at_id"},
+        "queries": ["GET /posts/feed/following", "POST /users/follow/{id}"],
+    },
+    {
+        "collection": "timelines",
+        "keys": [("user_id", ASCENDING), ("created_at", DESCENDING), ("post_id", DESCENDING)],
+        "options": {"name": "user_created_at_post_unique", "unique": True},
+        "queries": ["GET /posts/feed/following", "POST /users/unfollow/{id}", "timeline trim"],
+    },
+    {
+        "collection": "users",
+        "keys": [("followers_count", DESCENDING)],
+        "options": {"name": "followers_count"},
+        "queries": ["GET /posts/feed/following"],
+    },
+    {
+        "collection": "post_likes",
+        "keys": [("post_id", ASCENDING), ("user_id", ASCENDING)],
+        "options": {"name": "post_user_unique", "unique": True},
+        "queries": ["POST /posts/{id}/like"],
+    },
+    {
+        "collection": "post_comments",
+        "keys": [("post_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        "options": {"name": "post_created_at_id"},
+        "queries": ["GET /posts/{id}/comments", "POST /posts/{id}/comment"],
+    },
+    {
+        "collection": "orders",
+        "keys": [("user_id", ASCENDING), ("created_at", DESCENDING)],
+        "options": {"name": "user_created_at"},
+        "queries": ["GET /orders/my-orders"],
+    },
+    {
+        "collection": "orders",
+        "keys": [("created_at", DESCENDING), ("_id", DESCENDING)],
+        "options": {"name": "created_at_id"},
+        "queries": ["GET /orders"],
+    },
+    {
+        "collection": "wishlists",
+        "keys": [("user_id", ASCENDING)],
+        "options": {"name": "user_id_unique", "unique": True},
+        "queries": ["GET /wishlist", "POST /wishlist/add/{product_id}", "DELETE /wishlist/remove/{product_id}"],
+    },
+    {
+        "collection": "email_outbox",
+        "keys": [("status", ASCENDING), ("next_attempt_at", ASCENDING)],
+        "options": {"name": "status_next_attempt_at"},
+        "queries": ["email outbox worker claim"],
+    },
+    {
+        "collection": "timeline_jobs",
+        "keys": [("status", ASCENDING), ("created_at", ASCENDING)],
+        "options": {"name": "status_created_at"},
+        "queries": ["timeline fan-out worker claim"],
+    },
+    {
+        "collection": "notification_jobs",
+        "keys": [("status", ASCENDING), ("created_at", ASCENDING)],
+        "options": {"name": "status_created_at"},
+        "queries": ["notification job worker claim"],
+    },
+    {
+        "collection": "push_tickets",
+        "keys": [("receipt_checked", ASCENDING), ("status", ASCENDING), ("created_at", ASCENDING)],
+        "options": {"name": "receipt_checked_status_created_at"},
+        "queries": ["push receipt checker", "GET /admin/notifications/stats"],
+    },
+    {
+        "collection": "push_tickets",
+        "keys": [("created_at", ASCENDING)],
+        # Expo keeps receipts for a day; a week of tickets is plenty for auditing
+        "options": {"name": "created_at_ttl", "expireAfterSeconds": 7 * 24 * 3600},
+        "queries": ["push ticket expiry"],
+    },
+]
+
+
+async def ensure_indexes(db) -> dict:
+    """Create every registered index; safe to run repeatedly"""
+    result = {"created": [], "failed": []}
+    for spec in INDEXES:
+        name = f"{spec['collection']}.{spec['options']['name']}"
+        try:
+            await db[spec["collection"]].create_indexes([IndexModel(spec["keys"], **spec["options"])])
+            result["created"].append(name)
+        except OperationFailure as e:
+            # e.g. duplicate emails block the unique index; keep going with the rest
+            logger.error(f"Index creation failed for {name}: {e}")
+            result["failed"].append(name)
+    return result
+
+
+def coverage_report() -> str:
+    """Human readable mapping of endpoint queries to the index that serves them"""
+    lines = []
+    for spec in INDEXES:
+        keys = ", ".join(f"{field} {({ASCENDING: 'asc', DESCENDING: 'desc'}).get(direction, direction)}" for field, direction in spec["keys"])
+        lines.append(f"{spec['collection']}.{spec['options']['name']} ({keys})")
+        for query in spec["queries"]:
+            lines.append(f"    covers {query}")
+    return "\n".join(lines)
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tlsAllowInvalidCertificates=True)
+    db = client[os.environ['DB_NAME']]
+
+    result = await ensure_indexes(db)
+    for name in result["created"]:
+        print(f"✓ {name}")
+    for name in result["failed"]:
+        print(f"✗ {name}")
+    print()
+    print(coverage_report())
+
+    client.close()
+    return not result["failed"]
+
+if __name__ == "__main__":
+    if "--report" in sys.argv:
+        print(coverage_report())
+    else:
+        sys.exit(0 if asyncio.run(main()) else 1)
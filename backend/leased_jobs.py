@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+
+class LeasedJobQueue:
+    """Base for durable work queues kept in a Mongo collection.
+
+    Workers claim a document by moving it from ``pending_status`` to
+    ``running_status`` with a lease (``locked_until``) and an ``attempts``
+    increment. A document whose worker died is claimed again once its lease
+    expires. A failed attempt goes back to pending after an exponential
+    backoff, and after ``<PREFIX>_MAX_ATTEMPTS`` attempts it is marked
+    ``failed`` for good.
+
+    Subclasses implement ``process`` for one claimed document, or override
+    ``run_once`` to claim several at a time.
+    """
+
+    name = "job"
+    pending_status = "queued"
+    running_status = "running"
+    error_field = "error"
+    claim_sort = [("created_at", 1)]
+
+    def __init__(self, env_prefix: str, max_attempts: int = 3, workers: int = 1, backoff_seconds: float = 30):
+        self.concurrency = int(os.getenv(f"{env_prefix}_WORKERS", workers))
+        self.max_attempts = int(os.getenv(f"{env_prefix}_MAX_ATTEMPTS", max_attempts))
+        self.base_backoff = float(os.getenv(f"{env_prefix}_BACKOFF_SECONDS", backoff_seconds))
+        self.max_backoff = float(os.getenv(f"{env_prefix}_MAX_BACKOFF_SECONDS", 3600))
+        self.poll_interval = float(os.getenv(f"{env_prefix}_POLL_SECONDS", 5))
+        self.lease = timedelta(seconds=int(os.getenv(f"{env_prefix}_LEASE_SECONDS", 120)))
+        self.collection = None
+        self._wakeup = None
+        self._tasks = []
+
+    def wake(self):
+        if self._wakeup:
+            self._wakeup.set()
+
+    def lease_fields(self) -> dict:
+        """$set fields that extend the lease on a claimed document"""
+        now = datetime.utcnow()
+        return {"locked_until": now + self.lease, "updated_at": now}
+
+    async def claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": self.pending_status, "next_attempt_at": {"$not": {"$gt": now}}},
+                    {"status": self.running_status, "locked_until": {"$lte": now}}
+                ],
+                "attempts": {"$not": {"$gte": self.max_attempts}}
+            },
+            {
+                "$set": {"status": self.running_status, "locked_until": now + self.lease, "updated_at": now},
+                "$inc": {"attempts": 1}
+            },
+            sort=self.claim_sort,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _fail_abandoned(self):
+        # Documents whose worker died on their last attempt are never claimed again
+        now = datetime.utcnow()
+        await self.collection.update_many(
+            {"status": self.running_status, "locked_until": {"$lte": now}, "attempts": {"$gte": self.max_attempts}},
+            {"$set": {"status": "failed", "finished_at": now, "updated_at": now}, "$unset": {"locked_until": ""}}
+        )
+
+    async def fail(self, doc: dict, error: str):
+        """Record a failed attempt: retry after a backoff, or give up after max_attempts"""
+        now = datetime.utcnow()
+        attempts = doc["attempts"]
+        if attempts >= self.max_attempts:
+            update = {"status": "failed", "finished_at": now}
+        else:
+            delay = min(self.base_backoff * (2 ** (attempts - 1)), self.max_backoff)
+            update = {"status": self.pending_status, "next_attempt_at": now + timedelta(seconds=delay)}
+        await self.collection.update_one(
+            {"_id": doc["_id"]},
+            {"$set": {**update, self.error_field: error, "updated_at": now}, "$unset": {"locked_until": ""}}
+        )
+        logger.warning(f"{self.name} {doc['_id']} attempt {attempts} failed: {error}")
+
+    async def process(self, doc: dict):
+        raise NotImplementedError
+
+    async def run_once(self) -> bool:
+        """Claim and process one document; False when there was nothing to do"""
+        doc = await self.claim()
+        if not doc:
+            return False
+        try:
+            await self.process(doc)
+        except asyncio.CancelledError:
+            # Left leased; claimed again once the lease expires
+            raise
+        except Exception as e:
+            await self.fail(doc, str(e))
+        return True
+
+    async def _worker(self):
+        while True:
+            # Cleared before claiming so an enqueue racing with an empty claim still wakes us
+            self._wakeup.clear()
+            try:
+                await self._fail_abandoned()
+                if await self.run_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{self.name} worker error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start_workers(self, collection):
+        self.collection = collection
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
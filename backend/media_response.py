@@ -0,0 +1,119 @@
+import os
+import re
+from typing import Optional, Tuple
+import anyio
+from starlette.responses import FileResponse, Response
+
+# Blob keys embed the sha256 of their content, so a URL's bytes never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(ValueError):
+    """Raised for a Range header that selects no bytes of the file"""
+
+
+def etag_for(key: str) -> str:
+    # The file name (digest plus variant suffix) is already a strong validator
+    return f'"{os.path.basename(key).split(".")[0]}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match / If-Range header against etag"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) for a single-range ``bytes=`` header, or None to send the whole file.
+
+    Multi-range and malformed headers are ignored, which RFC 9110 allows.
+    """
+    match = RANGE_PATTERN.match((header or "").replace(" ", ""))
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(header)
+    return start, end
+
+
+class MediaFileResponse(FileResponse):
+    """FileResponse that can send a single byte range.
+
+    Whole-file responses go through FileResponse, which hands the path to the
+    server (``http.response.pathsend``) for a zero-copy send when supported.
+    """
+
+    def __init__(self, path, stat_result: os.stat_result, byte_range: Optional[Tuple[int, int]] = None, **kwargs):
+        self.byte_range = byte_range
+        super().__init__(path, stat_result=stat_result, **kwargs)
+        if byte_range is not None:
+            start, end = byte_range
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+            self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope, receive, send):
+        if self.byte_range is None:
+            await super().__call__(scope, receive, send)
+            return
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        start, end = self.byte_range
+        remaining = end - start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # File shrank underneath us; close the body anyway
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def media_response(request, path, key: str, media_type: str) -> Response:
+    """Serve a stored blob honouring If-None-Match, Range and If-Range.
+
+    media_type is the type the blob was stored with; browsers are told not to
+    sniff a different one from the bytes.
+    """
+    stat_result = os.stat(path)
+    etag = etag_for(key)
+    headers = {
+        "etag": etag,
+        "cache-control": IMMUTABLE_CACHE_CONTROL,
+        "accept-ranges": "bytes",
+        "x-content-type-options": "nosniff"
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or etag_matches(if_range, etag):
+        try:
+            byte_range = parse_range(request.headers.get("range"), stat_result.st_size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{stat_result.st_size}"})
+    return MediaFileResponse(path, stat_result, byte_range, headers=headers, media_type=media_type)
@@ -0,0 +1,393 @@
+import asyncio
+import base64
+import hashlib
+import io
+import mimetypes
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+ROOT_DIR = Path(__file__).parent
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+# <2 hex>/<2 hex>/<sha256>[_variant][.ext] - the sharded content address of a blob
+KEY_PATTERN = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(_[a-z]+)?(\.[a-z0-9]+)?$")
+
+# Resized variants generated for every stored image: name -> (max width, max height, square crop)
+IMAGE_VARIANTS = {
+    "list": (400, 400, False),
+    "detail": (1080, 1440, False),
+    "avatar": (160, 160, True),
+}
+# Variants are always WebP (which keeps alpha), so a variant's URL follows from its original's
+VARIANT_EXTENSION = ".webp"
+VARIANT_CONTENT_TYPE = "image/webp"
+# Media store URL of an original image: <base>/<key>
+MEDIA_URL_PATTERN = re.compile(r"^(?P<base>.*/)(?P<key>[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+)$")
+# The only types accepted and served: content type -> extension, and the Pillow format they decode as
+IMAGE_CONTENT_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+IMAGE_FORMATS = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+}
+# Sidecar next to a local blob holding the content type it was stored with
+CONTENT_TYPE_SUFFIX = ".type"
+DATA_URI_PATTERN = re.compile(r"^data:(?P<mime>[\w.+-]+/[\w.+-]+)?(;[\w-]+=[\w.-]+)*;base64,(?P<data>.*)$", re.S)
+
+
+class InvalidMediaKey(ValueError):
+    """Raised for keys that are not content addresses produced by the store"""
+
+
+class UploadTooLarge(ValueError):
+    """Raised when a streamed upload exceeds MEDIA_MAX_UPLOAD_BYTES"""
+
+
+class UnsupportedMediaType(ValueError):
+    """Raised for content that isn't a JPEG, PNG, WebP or GIF image"""
+
+
+def extension_for(content_type: str) -> str:
+    if content_type in IMAGE_CONTENT_TYPES:
+        return IMAGE_CONTENT_TYPES[content_type]
+    return mimetypes.guess_extension(content_type or "") or ""
+
+
+def detect_image_type(source) -> Optional[str]:
+    """Content type of an image path or file object judged by its bytes; None unless it's an allowed image"""
+    from PIL import Image
+
+    try:
+        with Image.open(source, formats=list(IMAGE_FORMATS)) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        return None
+    return IMAGE_FORMATS.get(image_format)
+
+
+def content_key(digest: str, content_type: str) -> str:
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{extension_for(content_type)}"
+
+
+def variant_key(key: str, variant: str) -> str:
+    return f"{key.split('.')[0]}_{variant}{VARIANT_EXTENSION}"
+
+
+def media_key(url: Optional[str]) -> Optional[str]:
+    """Key of an original image from its media store URL; None for any other URL"""
+    match = MEDIA_URL_PATTERN.match(url or "")
+    return match.group("key") if match else None
+
+
+def variant_url(url: Optional[str], variant: str) -> Optional[str]:
+    """URL of a resized variant of a media store image; other URLs are returned unchanged"""
+    match = MEDIA_URL_PATTERN.match(url or "")
+    if not match:
+        return url
+    return f"{match.group('base')}{variant_key(match.group('key'), variant)}"
+
+
+def render_variants(source) -> Dict[str, bytes]:
+    """Resize an image (a file path or its bytes) into every IMAGE_VARIANTS entry as WebP.
+
+    Runs in a worker process. Returns {} when the image isn't one Pillow can decode.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as original:
+            original = ImageOps.exif_transpose(original)
+            has_alpha = original.mode in ("RGBA", "LA") or (original.mode == "P" and "transparency" in original.info)
+            image = original.convert("RGBA" if has_alpha else "RGB")
+    except Exception:
+        return {}
+
+    variants = {}
+    for name, (width, height, crop) in IMAGE_VARIANTS.items():
+        if crop:
+            resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail((width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        resized.save(buffer, "WEBP", quality=80, method=4)
+        variants[name] = buffer.getvalue()
+    return variants
+
+
+def decode_data_uri(uri: str) -> Optional[Tuple[bytes, str]]:
+    """(bytes, content_type) for a base64 data URI, or None if uri isn't one"""
+    match = DATA_URI_PATTERN.match(uri or "")
+    if not match:
+        return None
+    return base64.b64decode(match.group("data")), match.group("mime") or "application/octet-stream"
+
+
+class LocalBlobStore:
+    """Stores blobs on the local filesystem under MEDIA_ROOT"""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def path(self, key: str) -> Path:
+        if not KEY_PATTERN.match(key):
+            raise InvalidMediaKey(key)
+        return self.root / key
+
+    def _exists(self, key: str) -> bool:
+        return self.path(key).exists()
+
+    def _write_atomic(self, path: Path, data: bytes):
+        # Write then rename so readers never see a partially written file
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+
+    def _write_content_type(self, path: Path, content_type: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written before the blob so a servable blob always has its type
+        self._write_atomic(Path(f"{path}{CONTENT_TYPE_SUFFIX}"), content_type.encode())
+
+    def _write(self, key: str, data: bytes, content_type: str):
+        path = self.path(key)
+        self._write_content_type(path, content_type)
+        self._write_atomic(path, data)
+
+    def content_type(self, key: str) -> str:
+        """The content type a blob was stored with.
+
+        Blobs stored before types were recorded fall back to their extension,
+        but only for allowed image types; anything else is served as opaque bytes.
+        """
+        path = self.path(key)
+        try:
+            return Path(f"{path}{CONTENT_TYPE_SUFFIX}").read_text().strip()
+        except FileNotFoundError:
+            extensions = {ext: content_type for content_type, ext in IMAGE_CONTENT_TYPES.items()}
+            return extensions.get(path.suffix, "application/octet-stream")
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._exists, key)
+
+    async def write(self, key: str, data: bytes, content_type: str):
+        await asyncio.to_thread(self._write, key, data, content_type)
+
+    async def read(self, key: str) -> bytes:
+        return await asyncio.to_thread(self.path(key).read_bytes)
+
+    def temp_dir(self) -> Path:
+        # Staged uploads live on the same filesystem so finishing one is a rename
+        path = self.root / ".uploads"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def _write_file(self, key: str, source_path: str, content_type: str):
+        path = self.path(key)
+        self._write_content_type(path, content_type)
+        os.replace(source_path, path)
+
+    async def write_file(self, key: str, source_path: str, content_type: str):
+        await asyncio.to_thread(self._write_file, key, source_path, content_type)
+
+
+class S3BlobStore:
+    """Stores blobs in an S3-compatible bucket (MinIO, R2, AWS S3)"""
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None):
+        import boto3
+
+        self.bucket = bucket
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def _exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._exists, key)
+
+    def _read(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    async def read(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._read, key)
+
+    async def write(self, key: str, data: bytes, content_type: str):
+        await asyncio.to_thread(
+            self.client.put_object,
+            Bucket=self.bucket,
+            Key=key,
+            Body=data,
+            ContentType=content_type,
+            CacheControl="public, max-age=31536000, immutable"
+        )
+
+    def temp_dir(self) -> Path:
+        return Path(tempfile.gettempdir())
+
+    def _write_file(self, key: str, source_path: str, content_type: str):
+        self.client.upload_file(
+            source_path,
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": content_type, "CacheControl": "public, max-age=31536000, immutable"}
+        )
+        os.unlink(source_path)
+
+    async def write_file(self, key: str, source_path: str, content_type: str):
+        await asyncio.to_thread(self._write_file, key, source_path, content_type)
+
+
+class MediaStorage:
+    """Content-addressed media store: identical uploads map to the same key and URL"""
+
+    def __init__(self):
+        self.base_url = os.getenv("MEDIA_BASE_URL")
+        self.max_upload_bytes = int(os.getenv("MEDIA_MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+        self.thumbnail_workers = int(os.getenv("MEDIA_THUMBNAIL_WORKERS", 2))
+        self._thumbnail_pool = None
+        if os.getenv("MEDIA_STORAGE", "local") == "s3":
+            self.backend = S3BlobStore(os.environ["S3_BUCKET"], os.getenv("S3_ENDPOINT_URL"))
+        else:
+            self.backend = LocalBlobStore(Path(os.getenv("MEDIA_ROOT", ROOT_DIR / "media")))
+
+    @property
+    def is_local(self) -> bool:
+        return isinstance(self.backend, LocalBlobStore)
+
+    def url(self, key: str, base_url: Optional[str] = None) -> str:
+        return f"{(self.base_url or base_url or '/api/media').rstrip('/')}/{key}"
+
+    async def save(self, data: bytes, content_type: str) -> dict:
+        """Store an image held in memory, typed by its bytes rather than content_type.
+
+        Raises UnsupportedMediaType unless it is an allowed image.
+        """
+        content_type = await asyncio.to_thread(detect_image_type, io.BytesIO(data))
+        if content_type is None:
+            raise UnsupportedMediaType("Not a JPEG, PNG, WebP or GIF image")
+        key = content_key(hashlib.sha256(data).hexdigest(), content_type)
+        deduplicated = await self.backend.exists(key)
+        variants = await self._ensure_variants(key, data)
+        if not deduplicated:
+            await self.backend.write(key, data, content_type)
+        return {"key": key, "size": len(data), "content_type": content_type, "deduplicated": deduplicated, "variants": variants}
+
+    async def save_data_uri(self, uri: str) -> Optional[dict]:
+        """Store the image in a base64 data URI; None if uri isn't one.
+
+        Raises UploadTooLarge past MEDIA_MAX_UPLOAD_BYTES and UnsupportedMediaType
+        for anything but an allowed image.
+        """
+        try:
+            decoded = decode_data_uri(uri)
+        except ValueError:
+            raise UnsupportedMediaType("Malformed data URI")
+        if decoded is None:
+            return None
+        data, content_type = decoded
+        if len(data) > self.max_upload_bytes:
+            raise UploadTooLarge(f"Upload exceeds {self.max_upload_bytes} bytes")
+        return await self.save(data, content_type)
+
+    @property
+    def thumbnail_pool(self) -> ProcessPoolExecutor:
+        if self._thumbnail_pool is None:
+            self._thumbnail_pool = ProcessPoolExecutor(max_workers=self.thumbnail_workers)
+        return self._thumbnail_pool
+
+    async def _stage(self, upload) -> Tuple[str, str, int]:
+        """Stream an upload to a temp file in chunks, returning (path, sha256, size)"""
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.backend.temp_dir(), prefix="upload-")
+        try:
+            with os.fdopen(fd, "wb") as temp:
+                while True:
+                    chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_upload_bytes:
+                        raise UploadTooLarge(f"Upload exceeds {self.max_upload_bytes} bytes")
+                    digest.update(chunk)
+                    await asyncio.to_thread(temp.write, chunk)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return temp_path, digest.hexdigest(), size
+
+    async def _ensure_variants(self, key: str, source) -> Dict[str, str]:
+        """Variant keys of an image, rendering from source (a path or bytes) any that are missing"""
+        keys = {name: variant_key(key, name) for name in IMAGE_VARIANTS}
+        missing = [name for name, candidate in keys.items() if not await self.backend.exists(candidate)]
+        if missing:
+            loop = asyncio.get_running_loop()
+            rendered = await loop.run_in_executor(self.thumbnail_pool, render_variants, source)
+            for name in missing:
+                if name not in rendered:
+                    # Not an image Pillow can decode; there is nothing to resize
+                    del keys[name]
+                    continue
+                await self.backend.write(keys[name], rendered[name], VARIANT_CONTENT_TYPE)
+        return keys
+
+    async def ensure_variants(self, url: str) -> bool:
+        """Render missing variants for an image already in the store; False if url isn't one of its originals"""
+        key = media_key(url)
+        if key is None or not await self.backend.exists(key):
+            return False
+        await self._ensure_variants(key, await self.backend.read(key))
+        return True
+
+    async def save_upload(self, upload, content_type: str) -> dict:
+        """Stream an UploadFile into the store and generate its resized variants.
+
+        content_type is the client's claim; the stored type comes from the bytes.
+        Raises UnsupportedMediaType unless both are an allowed image type.
+        """
+        if content_type not in IMAGE_CONTENT_TYPES:
+            raise UnsupportedMediaType(content_type)
+        temp_path, digest, size = await self._stage(upload)
+        try:
+            content_type = await asyncio.to_thread(detect_image_type, temp_path)
+            if content_type is None:
+                raise UnsupportedMediaType("Not a JPEG, PNG, WebP or GIF image")
+            key = content_key(digest, content_type)
+            deduplicated = await self.backend.exists(key)
+            variants = await self._ensure_variants(key, temp_path)
+            if not deduplicated:
+                await self.backend.write_file(key, temp_path, content_type)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        return {
+            "key": key,
+            "size": size,
+            "content_type": content_type,
+            "deduplicated": deduplicated,
+            "variants": variants
+        }
+
+    def shutdown(self):
+        if self._thumbnail_pool is not None:
+            self._thumbnail_pool.shutdown(wait=False)
+
+media_storage = MediaStorage()
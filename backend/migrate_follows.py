@@ -0,0 +1,80 @@
+"""
+Move the follower graph out of user documents into the follows collection.
+
+Every entry of ``users.following`` / ``users.followers`` becomes a
+``{follower_id, followee_id}`` edge (the two arrays mirror each other, so
+the unique index collapses duplicates). Each migrated user then gets
+``followers_count`` / ``following_count`` counted from the edges and the
+arrays removed. Safe to re-run.
+
+Usage: python migrate_follows.py [--dry-run]
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+from indexes import ensure_indexes
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+
+def edges_for(user: dict) -> list:
+    user_id = str(user["_id"])
+    now = datetime.utcnow()
+    edges = [{"follower_id": user_id, "followee_id": followee_id, "created_at": now} for followee_id in user.get("following") or []]
+    edges += [{"follower_id": follower_id, "followee_id": user_id, "created_at": now} for follower_id in user.get("followers") or []]
+    return edges
+
+
+async def main():
+    dry_run = "--dry-run" in sys.argv
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tlsAllowInvalidCertificates=True)
+    db = client[os.environ['DB_NAME']]
+
+    print(f"Migrating follows{' (dry run)' if dry_run else ''}...")
+    if not dry_run:
+        await ensure_indexes(db)
+
+    query = {"$or": [{"followers": {"$exists": True}}, {"following": {"$exists": True}}]}
+    projection = {"followers": 1, "following": 1}
+    users, edges = 0, 0
+    async for user in db.users.find(query, projection):
+        users += 1
+        user_edges = edges_for(user)
+        edges += len(user_edges)
+        if user_edges and not dry_run:
+            try:
+                await db.follows.insert_many(user_edges, ordered=False)
+            except BulkWriteError:
+                # Mirrored or previously migrated edges
+                pass
+
+    if not dry_run:
+        # Counters are only trustworthy once every user's edges are in
+        async for user in db.users.find(query, {"_id": 1}):
+            user_id = str(user["_id"])
+            await db.users.update_one(
+                {"_id": user["_id"]},
+                {
+                    "$set": {
+                        "followers_count": await db.follows.count_documents({"followee_id": user_id}),
+                        "following_count": await db.follows.count_documents({"follower_id": user_id})
+                    },
+                    "$unset": {"followers": "", "following": ""}
+                }
+            )
+        await db.users.update_many({"followers_count": {"$exists": False}}, {"$set": {"followers_count": 0}})
+        await db.users.update_many({"following_count": {"$exists": False}}, {"$set": {"following_count": 0}})
+
+    print(f"✓ {users} users: {edges} follow entries moved into the follows collection")
+    client.close()
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,104 @@
+"""
+Move base64 data URIs embedded in documents into the media store.
+
+Rewrites products.images, brands.logo/banner, posts.media and
+users.profile_photo so they hold media URLs instead of inline data.
+MEDIA_BASE_URL must be set to the public media URL (e.g.
+https://api.example.com/api/media) so stored URLs resolve from the app.
+Data URIs that aren't JPEG, PNG, WebP or GIF images are left inline.
+Images already in the media store get any resized variants they lack, so
+list endpoints can serve the list-sized variant of every image.
+
+Usage: python migrate_media.py [--dry-run]
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from media_storage import UnsupportedMediaType, decode_data_uri, media_key, media_storage
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# collection -> fields that may hold data URIs (lists are rewritten element-wise)
+MEDIA_FIELDS = {
+    "products": ["images"],
+    "brands": ["logo", "banner"],
+    "posts": ["media"],
+    "users": ["profile_photo"],
+}
+
+
+async def externalize(value, stats: dict, dry_run: bool):
+    """Return value with every data URI replaced by a media URL"""
+    if isinstance(value, list):
+        return [await externalize(item, stats, dry_run) for item in value]
+    if not isinstance(value, str):
+        return value
+    decoded = decode_data_uri(value)
+    if decoded is None:
+        if media_key(value) and not dry_run and await media_storage.ensure_variants(value):
+            stats["variants"] += 1
+        return value
+    data, content_type = decoded
+    stats["blobs"] += 1
+    stats["bytes_saved"] += len(value)
+    if dry_run:
+        return value
+    try:
+        stored = await media_storage.save(data, content_type)
+    except UnsupportedMediaType:
+        # Only images are served from the media store; leave anything else inline
+        stats["skipped"] += 1
+        stats["bytes_saved"] -= len(value)
+        return value
+    if stored["deduplicated"]:
+        stats["deduplicated"] += 1
+    return media_storage.url(stored["key"])
+
+
+async def migrate_collection(db, collection: str, fields: list, dry_run: bool) -> dict:
+    stats = {"documents": 0, "blobs": 0, "deduplicated": 0, "skipped": 0, "variants": 0, "bytes_saved": 0}
+    # Inline data, or media store originals that may still lack variants
+    query = {"$or": [{field: {"$regex": pattern}} for field in fields for pattern in ("^data:", "/[0-9a-f]{64}\\.[a-z0-9]+$")]}
+    projection = {field: 1 for field in fields}
+
+    async for doc in db[collection].find(query, projection):
+        updates = {}
+        for field in fields:
+            if field in doc:
+                new_value = await externalize(doc[field], stats, dry_run)
+                if new_value != doc[field]:
+                    updates[field] = new_value
+        if updates or dry_run:
+            stats["documents"] += 1
+        if updates and not dry_run:
+            await db[collection].update_one({"_id": doc["_id"]}, {"$set": updates})
+    return stats
+
+
+async def main():
+    dry_run = "--dry-run" in sys.argv
+    if not dry_run and not media_storage.base_url:
+        print("MEDIA_BASE_URL must be set so migrated documents get absolute URLs")
+        return False
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tlsAllowInvalidCertificates=True)
+    db = client[os.environ['DB_NAME']]
+
+    print(f"Migrating inline media{' (dry run)' if dry_run else ''}...")
+    for collection, fields in MEDIA_FIELDS.items():
+        stats = await migrate_collection(db, collection, fields, dry_run)
+        print(
+            f"✓ {collection}: {stats['documents']} documents, {stats['blobs']} blobs "
+            f"({stats['deduplicated']} deduplicated, {stats['skipped']} not images), {stats['variants']} given variants, {stats['bytes_saved'] / 1024 / 1024:.1f} MB moved out of Mongo"
+        )
+
+    client.close()
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
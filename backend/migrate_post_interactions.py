@@ -0,0 +1,83 @@
+"""
+Move likes and comments embedded in posts into their own collections.
+
+Every post with a ``likes`` or ``comments`` array gets one ``post_likes`` /
+``post_comments`` document per entry, ``likes_count`` / ``comments_count``
+counters computed from those collections, and the arrays removed. Safe to
+re-run: likes are deduplicated by the unique (post_id, user_id) index and a
+post's arrays are only dropped once its rows are written.
+
+Usage: python migrate_post_interactions.py [--dry-run]
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+from indexes import ensure_indexes
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+
+async def migrate_post(db, post: dict, dry_run: bool) -> dict:
+    post_id = str(post["_id"])
+    likes = post.get("likes") or []
+    comments = post.get("comments") or []
+    if dry_run:
+        return {"likes": len(likes), "comments": len(comments)}
+
+    if likes:
+        try:
+            await db.post_likes.insert_many(
+                [{"post_id": post_id, "user_id": user_id, "liked": True, "created_at": post.get("created_at")} for user_id in likes],
+                ordered=False
+            )
+        except BulkWriteError:
+            # Rows left over from an interrupted run
+            pass
+    if comments:
+        # Comments have no natural key, so clear any partial copy before rewriting
+        await db.post_comments.delete_many({"post_id": post_id})
+        await db.post_comments.insert_many([{**comment, "post_id": post_id} for comment in comments])
+
+    likes_count = await db.post_likes.count_documents({"post_id": post_id, "liked": True})
+    comments_count = await db.post_comments.count_documents({"post_id": post_id})
+    await db.posts.update_one(
+        {"_id": post["_id"]},
+        {"$set": {"likes_count": likes_count, "comments_count": comments_count}, "$unset": {"likes": "", "comments": ""}}
+    )
+    return {"likes": len(likes), "comments": len(comments)}
+
+
+async def main():
+    dry_run = "--dry-run" in sys.argv
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tlsAllowInvalidCertificates=True)
+    db = client[os.environ['DB_NAME']]
+
+    print(f"Migrating post likes and comments{' (dry run)' if dry_run else ''}...")
+    if not dry_run:
+        await ensure_indexes(db)
+
+    totals = {"posts": 0, "likes": 0, "comments": 0}
+    query = {"$or": [{"likes": {"$exists": True}}, {"comments": {"$exists": True}}]}
+    async for post in db.posts.find(query, {"likes": 1, "comments": 1, "created_at": 1}):
+        counts = await migrate_post(db, post, dry_run)
+        totals["posts"] += 1
+        totals["likes"] += counts["likes"]
+        totals["comments"] += counts["comments"]
+
+    if not dry_run:
+        # Posts that never had arrays still need counters for the feed projection
+        await db.posts.update_many({"likes_count": {"$exists": False}}, {"$set": {"likes_count": 0}})
+        await db.posts.update_many({"comments_count": {"$exists": False}}, {"$set": {"comments_count": 0}})
+
+    print(f"✓ {totals['posts']} posts: {totals['likes']} likes, {totals['comments']} comments moved out of post documents")
+    client.close()
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,124 @@
+import os
+from datetime import datetime
+from typing import List, Optional
+from bson import ObjectId
+from leased_jobs import LeasedJobQueue
+from push_service import push_dispatcher
+
+
+def recipients_query(user_ids: Optional[List[str]] = None) -> dict:
+    query = {"expo_push_token": {"$exists": True, "$nin": [None, ""]}}
+    if user_ids:
+        query["_id"] = {"$in": [ObjectId(uid) for uid in user_ids]}
+    return query
+
+
+async def _iterate(items):
+    for item in items:
+        yield item
+
+
+class NotificationJobQueue(LeasedJobQueue):
+    """Broadcast notifications as resumable background jobs.
+
+    Jobs live in the ``notification_jobs`` collection. Recipients are walked in
+    ``_id`` order and the last processed ``_id`` is checkpointed after every
+    page, so a job whose worker died is resumed where it stopped once its lease
+    expires. The checkpoint moves past a page before it is sent, so a retry
+    never re-sends a page that may already have gone out; such a page is
+    counted as ``skipped``. Jobs that fail ``NOTIFICATION_JOB_MAX_ATTEMPTS``
+    times are marked ``failed``.
+    """
+
+    name = "Notification job"
+
+    def __init__(self):
+        super().__init__("NOTIFICATION_JOB", max_attempts=3)
+        self.page_size = int(os.getenv("NOTIFICATION_JOB_PAGE_SIZE", 600))
+        self.users = None
+
+    async def enqueue(self, title: str, body: str, user_ids: Optional[List[str]], created_by: str) -> Optional[dict]:
+        """Create a job for every matching user with a push token; None when nobody matches"""
+        total = await self.users.count_documents(recipients_query(user_ids))
+        if total == 0:
+            return None
+        now = datetime.utcnow()
+        job = {
+            "title": title,
+            "body": body,
+            "user_ids": user_ids,
+            "status": "queued",
+            "total": total,
+            "sent": 0,
+            "failed": 0,
+            "skipped": 0,
+            "in_flight": 0,
+            "attempts": 0,
+            "checkpoint": None,
+            "error": None,
+            "created_by": created_by,
+            "created_at": now,
+            "updated_at": now,
+            "started_at": None,
+            "finished_at": None
+        }
+        result = await self.collection.insert_one(job)
+        job["_id"] = result.inserted_id
+        self.wake()
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"_id": ObjectId(job_id)})
+
+    async def process(self, job: dict):
+        job_id = job["_id"]
+        if job.get("started_at") is None:
+            await self.collection.update_one({"_id": job_id}, {"$set": {"started_at": datetime.utcnow()}})
+        checkpoint = job.get("checkpoint")
+        if job.get("in_flight"):
+            # The previous attempt died mid-page; those recipients may already have it
+            await self.collection.update_one(
+                {"_id": job_id},
+                {"$inc": {"skipped": job["in_flight"]}, "$set": {"in_flight": 0}}
+            )
+
+        while True:
+            query = recipients_query(job.get("user_ids"))
+            if checkpoint is not None:
+                query = {"$and": [query, {"_id": {"$gt": checkpoint}}]}
+            page = await self.users.find(query, {"expo_push_token": 1}).sort("_id", 1).limit(self.page_size).to_list(self.page_size)
+            if not page:
+                break
+
+            checkpoint = page[-1]["_id"]
+            await self.collection.update_one(
+                {"_id": job_id},
+                {"$set": {"checkpoint": checkpoint, "in_flight": len(page), **self.lease_fields()}}
+            )
+
+            result = await push_dispatcher.dispatch(
+                _iterate([user["expo_push_token"] for user in page]),
+                job["title"],
+                job["body"],
+                data={"type": "admin_notification", "job_id": str(job_id)},
+                tags={"job_id": job_id}
+            )
+            await self.collection.update_one(
+                {"_id": job_id},
+                {
+                    "$inc": {"sent": result["sent"], "failed": result["failed"]},
+                    "$set": {"in_flight": 0, **self.lease_fields()}
+                }
+            )
+
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "completed", "finished_at": now, "updated_at": now}, "$unset": {"locked_until": ""}}
+        )
+
+    def start(self, db):
+        self.users = db.users
+        self.start_workers(db.notification_jobs)
+
+notification_jobs = NotificationJobQueue()
@@ -0,0 +1,61 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Every keyset-paginated listing is ordered newest first with _id as the tie-breaker
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(doc: dict, field: str = "created_at") -> str:
+    """Build an opaque cursor pointing just past the given document"""
+    value = doc.get(field)
+    payload = {
+        "t": value.isoformat() if isinstance(value, datetime) else None,
+        "id": str(doc["_id"]),
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = datetime.fromisoformat(payload["t"]) if payload.get("t") else None
+        return value, ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise InvalidCursor(cursor)
+
+
+def keyset_query(query: dict, cursor: Optional[str], field: str = "created_at", id_field: str = "_id") -> dict:
+    """Restrict query to documents that sort after the cursor in KEYSET_SORT order.
+
+    ``id_field`` names the tie-breaker for collections keyed by another
+    document's id (e.g. timeline entries ordered by ``post_id``).
+    """
+    if not cursor:
+        return query
+    value, last_id = decode_cursor(cursor)
+    if value is None:
+        # Documents without the sort field sort last; only the _id tie-breaker remains
+        condition = {field: None, id_field: {"$lt": last_id}}
+    else:
+        condition = {"$or": [
+            {field: {"$lt": value}},
+            {field: value, id_field: {"$lt": last_id}},
+            {field: None},
+        ]}
+    return {"$and": [query, condition]} if query else condition
+
+
+def next_cursor(docs: List[dict], limit: int, field: str = "created_at") -> Optional[str]:
+    """Cursor for the following page, or None when this page was the last one"""
+    if not docs or len(docs) < limit:
+        return None
+    return encode_cursor(docs[-1], field)
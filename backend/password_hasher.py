@@ -0,0 +1,90 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password worker pool has no free queue slots"""
+
+
+class PasswordHasher:
+    """Runs bcrypt hashing/verification on a bounded worker pool off the event loop"""
+
+    def __init__(self):
+        self.max_workers = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+        self.max_queue = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
+        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._metrics = {
+            "completed": 0,
+            "rejected": 0,
+            "queue_wait_total_ms": 0.0,
+            "queue_wait_max_ms": 0.0,
+            "hash_time_total_ms": 0.0,
+            "hash_time_max_ms": 0.0,
+        }
+
+    def _record(self, queue_wait_ms: float, hash_time_ms: float):
+        with self._lock:
+            self._metrics["completed"] += 1
+            self._metrics["queue_wait_total_ms"] += queue_wait_ms
+            self._metrics["queue_wait_max_ms"] = max(self._metrics["queue_wait_max_ms"], queue_wait_ms)
+            self._metrics["hash_time_total_ms"] += hash_time_ms
+            self._metrics["hash_time_max_ms"] = max(self._metrics["hash_time_max_ms"], hash_time_ms)
+
+    def _timed(self, func, submitted_at: float, *args):
+        started_at = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            finished_at = time.perf_counter()
+            self._record((started_at - submitted_at) * 1000, (finished_at - started_at) * 1000)
+
+    async def _submit(self, func, *args):
+        # Anything beyond the running workers plus max_queue waiting jobs is shed
+        # immediately so a login burst can't pile up unbounded latency.
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._metrics["rejected"] += 1
+                raise PasswordHasherBusy()
+            self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, func, time.perf_counter(), *args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(self.pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit(self.pwd_context.verify, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            in_flight = self._in_flight
+        completed = metrics["completed"]
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": in_flight,
+            "queued": max(0, in_flight - self.max_workers),
+            "completed": completed,
+            "rejected": metrics["rejected"],
+            "queue_wait_avg_ms": round(metrics["queue_wait_total_ms"] / completed, 2) if completed else 0,
+            "queue_wait_max_ms": round(metrics["queue_wait_max_ms"], 2),
+            "hash_time_avg_ms": round(metrics["hash_time_total_ms"] / completed, 2) if completed else 0,
+            "hash_time_max_ms": round(metrics["hash_time_max_ms"], 2),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher()
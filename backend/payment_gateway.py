@@ -0,0 +1,139 @@
+import asyncio
+import os
+import threading
+import time
+import httpx
+
+
+class PaymentGatewayError(Exception):
+    """Raised when the payment gateway rejects a request or cannot be reached"""
+
+
+class CircuitBreakerOpen(PaymentGatewayError):
+    """Raised without calling the gateway while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets a single probe through once reset_timeout has passed"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half_open" and self._probing):
+                raise CircuitBreakerOpen("Payment gateway circuit is open")
+            if state == "half_open":
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """Let another call probe the gateway without counting this one as a success or failure"""
+        with self._lock:
+            self._probing = False
+
+
+class RazorpayGateway:
+    """Async Razorpay REST client with pooled connections, timeouts and a circuit breaker.
+
+    RAZORPAY_API_URL can point at fake_payment_gateway.py for local testing.
+    """
+
+    def __init__(self):
+        self.base_url = os.getenv("RAZORPAY_API_URL", "https://api.razorpay.com/v1")
+        self.key_id = os.getenv("RAZORPAY_KEY_ID")
+        self.key_secret = os.getenv("RAZORPAY_KEY_SECRET")
+        self.timeout = httpx.Timeout(
+            float(os.getenv("RAZORPAY_TIMEOUT_SECONDS", 10)),
+            connect=float(os.getenv("RAZORPAY_CONNECT_TIMEOUT_SECONDS", 3))
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("RAZORPAY_BREAKER_FAILURES", 5)),
+            reset_timeout=float(os.getenv("RAZORPAY_BREAKER_RESET_SECONDS", 30))
+        )
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=(self.key_id or "", self.key_secret or ""),
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+            )
+        return self._client
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        self.breaker.before_call()
+        try:
+            response = await self.client.post(path, json=payload)
+            if response.status_code >= 500:
+                raise PaymentGatewayError(f"Payment gateway error {response.status_code}: {response.text}")
+            if response.status_code < 400:
+                data = response.json()
+        except httpx.HTTPError as e:
+            self.breaker.record_failure()
+            raise PaymentGatewayError(f"Payment gateway unreachable: {e}")
+        except ValueError as e:
+            self.breaker.record_failure()
+            raise PaymentGatewayError(f"Payment gateway returned an invalid response: {e}")
+        except asyncio.CancelledError:
+            # Cancellation says nothing about the gateway's health, but must still release a half-open probe
+            self.breaker.release_probe()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+
+        # A 4xx is our request being rejected, not the gateway being unhealthy
+        self.breaker.record_success()
+        if response.status_code >= 400:
+            raise PaymentGatewayError(f"Payment gateway rejected request: {response.text}")
+        return data
+
+    async def create_order(self, amount: int, currency: str = "INR", payment_capture: int = 1) -> dict:
+        return await self._post("/orders", {
+            "amount": amount,
+            "currency": currency,
+            "payment_capture": payment_capture
+        })
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+payment_gateway = RazorpayGateway()
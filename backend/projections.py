@@ -0,0 +1,79 @@
+import re
+from typing import Optional
+
+FIELD_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z0-9_]+)*$")
+
+# Default "card" projections for list endpoints: only what list screens render.
+# created_at is always kept because keyset cursors are built from it.
+PRODUCT_CARD = {
+    "name": 1,
+    "brand_id": 1,
+    "price": 1,
+    "category": 1,
+    "gender": 1,
+    # The cover image; list endpoints serve its "list" variant (see media_storage.variant_url)
+    "images": {"$slice": 1},
+    "created_at": 1
+}
+
+# Aggregation form of PRODUCT_CARD for search results, ranked by text score
+PRODUCT_SEARCH_CARD = {
+    **PRODUCT_CARD,
+    "images": {"$slice": [{"$ifNull": ["$images", []]}, 1]},
+    "score": 1
+}
+
+BRAND_CARD = {
+    "name": 1,
+    "category": 1,
+    "logo": 1,
+    "status": 1,
+    "created_at": 1
+}
+
+ORDER_CARD = {
+    "items": 1,
+    "total_amount": 1,
+    "status": 1,
+    "payment_status": 1,
+    "created_at": 1
+}
+
+POST_COUNTS = {
+    "likes_count": 1,
+    "comments_count": 1
+}
+
+POST_CARD = {
+    "user_id": 1,
+    "content": 1,
+    "media": 1,
+    "tagged_products": 1,
+    "created_at": 1,
+    **POST_COUNTS
+}
+
+
+class InvalidFields(ValueError):
+    """Raised for a fields= value that isn't a comma separated list of field names"""
+
+
+def build_projection(fields: Optional[str], default: dict) -> Optional[dict]:
+    """Mongo projection for a ``fields=`` query parameter.
+
+    No value gives the endpoint's card projection, ``all`` gives the whole
+    document (None), otherwise the named fields plus created_at.
+    """
+    if fields is None:
+        return default
+    if fields.strip() == "all":
+        return None
+
+    projection = {"created_at": 1}
+    for name in (field.strip() for field in fields.split(",")):
+        if not name:
+            continue
+        if not FIELD_PATTERN.match(name):
+            raise InvalidFields(name)
+        projection[name] = 1
+    return projection
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import AsyncIterable, List, Optional
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class PushDispatcher:
+    """Fans Expo push notifications out in 100-message chunks over a shared async HTTP client.
+
+    Every per-token ticket Expo returns is recorded in the ``push_tickets``
+    collection so receipts can be checked later.
+    """
+
+    def __init__(self):
+        self.push_url = os.getenv("EXPO_PUSH_URL", "https://exp.host/--/api/v2/push/send")
+        self.receipts_url = os.getenv("EXPO_RECEIPTS_URL", "https://exp.host/--/api/v2/push/getReceipts")
+        self.access_token = os.getenv("EXPO_ACCESS_TOKEN")
+        # Expo accepts at most 100 messages per request
+        self.chunk_size = min(int(os.getenv("EXPO_PUSH_CHUNK_SIZE", 100)), 100)
+        self.concurrency = int(os.getenv("EXPO_PUSH_CONCURRENCY", 6))
+        self.timeout = float(os.getenv("EXPO_PUSH_TIMEOUT_SECONDS", 15))
+        self.tickets = None
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            headers = {"Accept": "application/json", "Content-Type": "application/json"}
+            if self.access_token:
+                headers["Authorization"] = f"Bearer {self.access_token}"
+            self._client = httpx.AsyncClient(
+                headers=headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+            )
+        return self._client
+
+    def start(self, db):
+        self.tickets = db.push_tickets
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def chunks(self, tokens: AsyncIterable[str]):
+        chunk = []
+        async for token in tokens:
+            chunk.append(token)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    async def send_chunk(self, tokens: List[str], title: str, body: str, data: Optional[dict] = None) -> List[dict]:
+        """Send one chunk and return a ticket per token, in order"""
+        messages = [
+            {"to": token, "sound": "default", "title": title, "body": body, "data": data or {}}
+            for token in tokens
+        ]
+        try:
+            response = await self.client.post(self.push_url, json=messages)
+            if response.status_code != 200:
+                raise RuntimeError(f"Expo push API returned {response.status_code}: {response.text}")
+            results = response.json().get("data", [])
+        except Exception as e:
+            logger.error(f"Push chunk of {len(tokens)} failed: {e}")
+            results = [{"status": "error", "message": str(e)}] * len(tokens)
+
+        if len(results) != len(tokens):
+            # Tokens without a result still get an error ticket so they show up in stats
+            logger.error(f"Expo returned {len(results)} results for a chunk of {len(tokens)} tokens")
+            missing = {"status": "error", "message": "No ticket returned by Expo"}
+            results = (results + [missing] * len(tokens))[:len(tokens)]
+
+        tickets = []
+        for token, result in zip(tokens, results):
+            tickets.append({
+                "token": token,
+                "status": result.get("status", "error"),
+                "ticket_id": result.get("id"),
+                "message": result.get("message"),
+                "error": (result.get("details") or {}).get("error")
+            })
+        return tickets
+
+    async def get_receipts(self, ticket_ids: List[str]) -> dict:
+        """Map of ticket id to receipt for ids Expo has a receipt for"""
+        response = await self.client.post(self.receipts_url, json={"ids": ticket_ids})
+        if response.status_code != 200:
+            raise RuntimeError(f"Expo receipts API returned {response.status_code}: {response.text}")
+        return response.json().get("data", {})
+
+    async def record(self, tickets: List[dict], tags: Optional[dict] = None):
+        if self.tickets is None or not tickets:
+            return
+        now = datetime.utcnow()
+        await self.tickets.insert_many([
+            {**ticket, **(tags or {}), "receipt_checked": False, "created_at": now}
+            for ticket in tickets
+        ])
+
+    async def dispatch(self, tokens: AsyncIterable[str], title: str, body: str, data: Optional[dict] = None, tags: Optional[dict] = None) -> dict:
+        """Stream tokens into chunks and send up to ``concurrency`` chunks at a time"""
+        totals = {"sent": 0, "failed": 0, "errors": []}
+        slots = asyncio.Semaphore(self.concurrency)
+        in_flight = set()
+
+        async def run(chunk):
+            try:
+                tickets = await self.send_chunk(chunk, title, body, data)
+                await self.record(tickets, tags)
+                for ticket in tickets:
+                    if ticket["status"] == "ok":
+                        totals["sent"] += 1
+                    else:
+                        totals["failed"] += 1
+                        if len(totals["errors"]) < 10:
+                            totals["errors"].append(ticket["message"])
+            finally:
+                slots.release()
+
+        async for chunk in self.chunks(tokens):
+            await slots.acquire()
+            task = asyncio.create_task(run(chunk))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        await asyncio.gather(*in_flight)
+        return totals
+
+push_dispatcher = PushDispatcher()
+
+
+class PushReceiptChecker:
+    """Periodically resolves push tickets into receipts and prunes dead device tokens.
+
+    Tokens Expo reports as ``DeviceNotRegistered`` - either straight away on the
+    ticket or later on the receipt - are removed from ``users`` in bulk so later
+    broadcasts only go to live devices.
+    """
+
+    def __init__(self):
+        self.interval = float(os.getenv("PUSH_RECEIPT_INTERVAL_SECONDS", 300))
+        # Expo only guarantees receipts some time after the ticket was issued
+        self.receipt_delay = timedelta(seconds=int(os.getenv("PUSH_RECEIPT_DELAY_SECONDS", 900)))
+        self.batch_size = min(int(os.getenv("PUSH_RECEIPT_BATCH_SIZE", 1000)), 1000)
+        self.tickets = None
+        self.users = None
+        self.stats = None
+        self._task = None
+
+    async def prune_tokens(self, tokens: List[str]) -> int:
+        if not tokens:
+            return 0
+        result = await self.users.update_many(
+            {"expo_push_token": {"$in": list(set(tokens))}},
+            {"$unset": {"expo_push_token": ""}}
+        )
+        if result.modified_count:
+            # Persisted so the total survives restarts and covers every worker
+            await self.stats.update_one(
+                {"_id": "pruned_tokens"},
+                {"$inc": {"count": result.modified_count}},
+                upsert=True
+            )
+        return result.modified_count
+
+    async def _prune_ticket_errors(self) -> int:
+        """Tickets rejected at send time need no receipt round-trip"""
+        query = {"status": "error", "error": "DeviceNotRegistered", "receipt_checked": False}
+        pruned = 0
+        while True:
+            tickets = await self.tickets.find(query, {"token": 1}).limit(self.batch_size).to_list(self.batch_size)
+            if not tickets:
+                return pruned
+            pruned += await self.prune_tokens([ticket["token"] for ticket in tickets])
+            await self.tickets.update_many(
+                {"_id": {"$in": [ticket["_id"] for ticket in tickets]}},
+                {"$set": {"receipt_checked": True, "pruned": True}}
+            )
+
+    async def _check_receipts(self) -> int:
+        query = {
+            "status": "ok",
+            "receipt_checked": False,
+            "created_at": {"$lte": datetime.utcnow() - self.receipt_delay}
+        }
+        pruned = 0
+        while True:
+            tickets = await self.tickets.find(query, {"token": 1, "ticket_id": 1}).limit(self.batch_size).to_list(self.batch_size)
+            if not tickets:
+                return pruned
+            receipts = await push_dispatcher.get_receipts([ticket["ticket_id"] for ticket in tickets])
+
+            dead_tokens, dead_ids, failed_ids, ok_ids = [], [], [], []
+            for ticket in tickets:
+                receipt = receipts.get(ticket["ticket_id"]) or {}
+                if receipt.get("status") == "error":
+                    if (receipt.get("details") or {}).get("error") == "DeviceNotRegistered":
+                        dead_tokens.append(ticket["token"])
+                        dead_ids.append(ticket["_id"])
+                    else:
+                        failed_ids.append(ticket["_id"])
+                else:
+                    # Missing receipts have expired or were delivered; nothing more to learn
+                    ok_ids.append(ticket["_id"])
+
+            pruned += await self.prune_tokens(dead_tokens)
+            for ids, receipt_status, extra in [
+                (dead_ids, "error", {"error": "DeviceNotRegistered", "pruned": True}),
+                (failed_ids, "error", {}),
+                (ok_ids, "ok", {}),
+            ]:
+                if ids:
+                    await self.tickets.update_many(
+                        {"_id": {"$in": ids}},
+                        {"$set": {"receipt_checked": True, "receipt_status": receipt_status, **extra}}
+                    )
+
+    async def run_once(self) -> int:
+        return await self._prune_ticket_errors() + await self._check_receipts()
+
+    async def _worker(self):
+        while True:
+            try:
+                pruned = await self.run_once()
+                if pruned:
+                    logger.info(f"Pruned {pruned} unregistered push tokens")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Push receipt check failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self, db):
+        self.tickets = db.push_tickets
+        self.users = db.users
+        self.stats = db.push_stats
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def pending_receipts(self) -> int:
+        return await self.tickets.count_documents({"status": "ok", "receipt_checked": False})
+
+    async def pruned_total(self) -> int:
+        doc = await self.stats.find_one({"_id": "pruned_tokens"})
+        return doc["count"] if doc else 0
+
+push_receipt_checker = PushReceiptChecker()
@@ -1,8 +1,9 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Body, File, UploadFile
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Body, File, UploadFile, Request, Response, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
 import logging
 from pathlib import Path
@@ -10,12 +11,27 @@ from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import jwt
 from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
-from passlib.context import CryptContext
-import razorpay
-import base64
 from email_service import email_service
+from email_outbox import email_outbox
+from password_hasher import password_hasher, PasswordHasherBusy
+from user_cache import user_cache, USER_AUTH_PROJECTION
+from pagination import KEYSET_SORT, InvalidCursor, keyset_query, next_cursor
+from indexes import ensure_indexes
+from catalog_cache import catalog_cache
+from payment_gateway import payment_gateway, CircuitBreakerOpen
+from push_service import push_dispatcher, push_receipt_checker
+from notification_jobs import notification_jobs
+from media_storage import media_storage, variant_url, InvalidMediaKey, UnsupportedMediaType, UploadTooLarge
+from media_response import media_response
+from upload_limit import UploadSizeLimit
+from projections import PRODUCT_CARD, PRODUCT_SEARCH_CARD, BRAND_CARD, ORDER_CARD, POST_CARD, POST_COUNTS, InvalidFields, build_projection
+from timelines import timelines
+from daily_stats import GRANULARITIES, daily_stats
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -32,25 +48,27 @@ client = AsyncIOMotorClient(
 db = client[os.environ['DB_NAME']]
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 SECRET_KEY = os.getenv("SECRET_KEY", "skyriting-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
-# Razorpay client
-razorpay_client = razorpay.Client(auth=(os.getenv("RAZORPAY_KEY_ID"), os.getenv("RAZORPAY_KEY_SECRET")))
-
 # Create the main app
 app = FastAPI(title="Skyriting API")
 api_router = APIRouter(prefix="/api")
 
 # Helper functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please try again", headers={"Retry-After": "1"})
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please try again", headers={"Retry-After": "1"})
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -59,6 +77,69 @@ def create_access_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+async def invalidate_product_cache(product_id: Optional[str] = None):
+    keys = ["products:trending", "products:new-arrivals"]
+    if product_id:
+        keys.append(f"product:{product_id}")
+    await catalog_cache.invalidate(*keys)
+
+def paginate(query: dict, cursor: Optional[str]) -> dict:
+    try:
+        return keyset_query(query, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def projection(fields: Optional[str], default: dict) -> Optional[dict]:
+    try:
+        return build_projection(fields, default)
+    except InvalidFields:
+        raise HTTPException(status_code=400, detail="Invalid fields")
+
+async def externalize_media(request: Request, doc: dict, fields: List[str]):
+    """Move inline data URIs in doc's media fields into the media store, leaving their URLs.
+
+    Documents only ever hold media URLs; a data URI that isn't an allowed image is refused.
+    """
+    base_url = f"{request.base_url}api/media"
+
+    async def store(value):
+        if not isinstance(value, str) or not value.startswith("data:"):
+            return value
+        try:
+            stored = await media_storage.save_data_uri(value)
+        except UploadTooLarge:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Image exceeds the {media_storage.max_upload_bytes / (1024 * 1024):.1f} MB upload limit"
+            )
+        except UnsupportedMediaType:
+            stored = None
+        if stored is None:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Only JPEG, PNG, WebP and GIF images can be uploaded"
+            )
+        return media_storage.url(stored["key"], base_url)
+
+    for field in fields:
+        value = doc.get(field)
+        if isinstance(value, list):
+            doc[field] = [await store(item) for item in value]
+        elif value is not None:
+            doc[field] = await store(value)
+
+def product_card(product: dict) -> dict:
+    """A product for list endpoints, with images pointing at their list-sized variants"""
+    card = {**product, "_id": str(product["_id"])}
+    if card.get("images"):
+        card["images"] = [variant_url(image, "list") for image in card["images"]]
+    return card
+
+def set_next_cursor(response: Response, docs: List[dict], limit: int):
+    cursor = next_cursor(docs, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
     try:
@@ -66,9 +147,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         user_id = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        user = user_cache.get(user_id)
         if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
+            user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_AUTH_PROJECTION)
+            if user is None:
+                raise HTTPException(status_code=401, detail="User not found")
+            user_cache.set(user_id, user)
         return user
     except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
@@ -166,7 +250,7 @@ async def register(user_data: UserRegister):
     # Create user
     user_dict = {
         "email": user_data.email,
-        "password_hash": hash_password(user_data.password),
+        "password_hash": await hash_password(user_data.password),
         "name": user_data.name,
         "gender": user_data.gender,
         "bio": user_data.bio,
@@ -175,14 +259,15 @@ async def register(user_data: UserRegister):
         "style_preferences": [],
         "role": "user",
         "is_verified": False,
-        "followers": [],
-        "following": [],
+        "followers_count": 0,
+        "following_count": 0,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
     
     result = await db.users.insert_one(user_dict)
     user_id = str(result.inserted_id)
+    await daily_stats.record_signup(user_dict["created_at"])
     
     # Create token
     token = create_access_token({"sub": user_id})
@@ -200,7 +285,7 @@ async def register(user_data: UserRegister):
 @api_router.post("/auth/login")
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email})
-    if not user or not verify_password(credentials.password, user["password_hash"]):
+    if not user or not await verify_password(credentials.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     token = create_access_token({"sub": str(user["_id"])})
@@ -226,15 +311,15 @@ async def get_me(current_user: dict = Depends(get_current_user)):
         "profile_photo": current_user.get("profile_photo"),
         "bio": current_user.get("bio"),
         "is_verified": current_user.get("is_verified", False),
-        "followers_count": len(current_user.get("followers", [])),
-        "following_count": len(current_user.get("following", []))
+        "followers_count": current_user.get("followers_count", 0),
+        "following_count": current_user.get("following_count", 0)
     }
 
 # User Routes
 @api_router.get("/users/{user_id}")
 async def get_user_profile(user_id: str):
     try:
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_AUTH_PROJECTION)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -245,21 +330,23 @@ async def get_user_profile(user_id: str):
             "profile_photo": user.get("profile_photo"),
             "role": user.get("role", "user"),
             "is_verified": user.get("is_verified", False),
-            "followers_count": len(user.get("followers", [])),
-            "following_count": len(user.get("following", []))
+            "followers_count": user.get("followers_count", 0),
+            "following_count": user.get("following_count", 0)
         }
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid user ID")
 
 @api_router.put("/users/profile")
-async def update_profile(profile_data: UserProfile, current_user: dict = Depends(get_current_user)):
+async def update_profile(profile_data: UserProfile, request: Request, current_user: dict = Depends(get_current_user)):
     update_dict = {k: v for k, v in profile_data.dict().items() if v is not None}
+    await externalize_media(request, update_dict, ["profile_photo"])
     update_dict["updated_at"] = datetime.utcnow()
     
     await db.users.update_one(
         {"_id": current_user["_id"]},
         {"$set": update_dict}
     )
+    user_cache.invalidate(current_user["_id"])
     
     return {"message": "Profile updated successfully"}
 
@@ -269,51 +356,105 @@ async def follow_user(user_id: str, current_user: dict = Depends(get_current_use
         raise HTTPException(status_code=400, detail="Cannot follow yourself")
     
     try:
-        target_user = await db.users.find_one({"_id": ObjectId(user_id)})
+        target_user = await db.users.find_one({"_id": ObjectId(user_id)}, {"followers_count": 1})
         if not target_user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Add to following list
-        await db.users.update_one(
-            {"_id": current_user["_id"]},
-            {"$addToSet": {"following": user_id}}
-        )
+        # The unique (follower_id, followee_id) index makes repeat follows a no-op
+        try:
+            await db.follows.insert_one({
+                "follower_id": str(current_user["_id"]),
+                "followee_id": user_id,
+                "created_at": datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            return {"message": "User followed successfully"}
         
-        # Add to followers list
-        await db.users.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$addToSet": {"followers": str(current_user["_id"])}}
-        )
+        await db.users.update_one({"_id": current_user["_id"]}, {"$inc": {"following_count": 1}})
+        await db.users.update_one({"_id": target_user["_id"]}, {"$inc": {"followers_count": 1}})
+        user_cache.invalidate(current_user["_id"], user_id)
+        await timelines.backfill(str(current_user["_id"]), target_user)
         
         return {"message": "User followed successfully"}
+    except HTTPException:
+        raise
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid user ID")
 
 @api_router.post("/users/unfollow/{user_id}")
 async def unfollow_user(user_id: str, current_user: dict = Depends(get_current_user)):
     try:
-        # Remove from following list
-        await db.users.update_one(
-            {"_id": current_user["_id"]},
-            {"$pull": {"following": user_id}}
-        )
-        
-        # Remove from followers list
-        await db.users.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$pull": {"followers": str(current_user["_id"])}}
-        )
+        result = await db.follows.delete_one({"follower_id": str(current_user["_id"]), "followee_id": user_id})
+        if result.deleted_count:
+            await db.users.update_one({"_id": current_user["_id"]}, {"$inc": {"following_count": -1}})
+            await db.users.update_one({"_id": ObjectId(user_id)}, {"$inc": {"followers_count": -1}})
+            user_cache.invalidate(current_user["_id"], user_id)
+            await timelines.remove_author(str(current_user["_id"]), user_id)
         
         return {"message": "User unfollowed successfully"}
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid user ID")
 
+async def list_follow_edges(response: Response, query: dict, user_field: str, limit: int, cursor: Optional[str]) -> List[dict]:
+    """Page through follows edges newest first and resolve the users on one side of them"""
+    edges = await db.follows.find(paginate(query, cursor)).sort(KEYSET_SORT).limit(limit).to_list(limit)
+    set_next_cursor(response, edges, limit)
+    
+    user_ids = [ObjectId(edge[user_field]) for edge in edges]
+    users = await db.users.find(
+        {"_id": {"$in": user_ids}},
+        {"name": 1, "profile_photo": 1, "is_verified": 1}
+    ).to_list(len(user_ids))
+    users_by_id = {str(user["_id"]): user for user in users}
+    
+    result = []
+    for edge in edges:
+        user = users_by_id.get(edge[user_field])
+        if user:
+            result.append({
+                "id": str(user["_id"]),
+                "name": user["name"],
+                "profile_photo": variant_url(user.get("profile_photo"), "avatar"),
+                "is_verified": user.get("is_verified", False),
+                "followed_at": edge["created_at"]
+            })
+    return result
+
+@api_router.get("/users/{user_id}/followers")
+async def get_followers(response: Response, user_id: str, limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None):
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    return await list_follow_edges(response, {"followee_id": user_id}, "follower_id", limit, cursor)
+
+@api_router.get("/users/{user_id}/following")
+async def get_following(response: Response, user_id: str, limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None):
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    return await list_follow_edges(response, {"follower_id": user_id}, "followee_id", limit, cursor)
+
 # Brand Routes
 @api_router.get("/brands")
-async def get_brands(status: Optional[str] = "approved"):
-    query = {} if status == "all" else {"status": status}
-    brands = await db.brands.find(query).to_list(1000)
-    return [{**brand, "_id": str(brand["_id"])} for brand in brands]
+async def get_brands(
+    response: Response,
+    status: Optional[str] = "approved",
+    limit: int = 1000,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    query = paginate({} if status == "all" else {"status": status}, cursor)
+    brand_projection = projection(fields, BRAND_CARD)
+    
+    async def load_brands():
+        brands = await db.brands.find(query, brand_projection).sort(KEYSET_SORT).limit(limit).to_list(limit)
+        return {
+            "items": [{**brand, "_id": str(brand["_id"])} for brand in brands],
+            "next_cursor": next_cursor(brands, limit)
+        }
+    
+    page = await catalog_cache.get_or_load(f"brands:{status}:{limit}:{cursor or ''}:{fields or ''}", load_brands)
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["items"]
 
 @api_router.get("/brands/{brand_id}")
 async def get_brand(brand_id: str):
@@ -326,8 +467,9 @@ async def get_brand(brand_id: str):
         raise HTTPException(status_code=400, detail="Invalid brand ID")
 
 @api_router.post("/brands")
-async def create_brand(brand_data: BrandCreate, current_user: dict = Depends(get_admin_user)):
+async def create_brand(brand_data: BrandCreate, request: Request, current_user: dict = Depends(get_admin_user)):
     brand_dict = brand_data.dict()
+    await externalize_media(request, brand_dict, ["logo", "banner"])
     brand_dict.update({
         "status": "approved",
         "created_at": datetime.utcnow(),
@@ -335,12 +477,14 @@ async def create_brand(brand_data: BrandCreate, current_user: dict = Depends(get
     })
     
     result = await db.brands.insert_one(brand_dict)
+    await catalog_cache.invalidate_prefix("brands:")
     return {"id": str(result.inserted_id), "message": "Brand created successfully"}
 
 @api_router.put("/brands/{brand_id}")
-async def update_brand(brand_id: str, brand_data: BrandUpdate, current_user: dict = Depends(get_admin_user)):
+async def update_brand(brand_id: str, brand_data: BrandUpdate, request: Request, current_user: dict = Depends(get_admin_user)):
     try:
         update_dict = {k: v for k, v in brand_data.dict().items() if v is not None}
+        await externalize_media(request, update_dict, ["logo", "banner"])
         update_dict["updated_at"] = datetime.utcnow()
         
         result = await db.brands.update_one(
@@ -350,6 +494,7 @@ async def update_brand(brand_id: str, brand_data: BrandUpdate, current_user: dic
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Brand not found")
+        await catalog_cache.invalidate_prefix("brands:")
         
         return {"message": "Brand updated successfully"}
     except HTTPException:
@@ -363,6 +508,7 @@ async def delete_brand(brand_id: str, current_user: dict = Depends(get_admin_use
         result = await db.brands.delete_one({"_id": ObjectId(brand_id)})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Brand not found")
+        await catalog_cache.invalidate_prefix("brands:")
         return {"message": "Brand deleted successfully"}
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid brand ID")
@@ -370,11 +516,14 @@ async def delete_brand(brand_id: str, current_user: dict = Depends(get_admin_use
 # Product Routes
 @api_router.get("/products")
 async def get_products(
+    response: Response,
     category: Optional[str] = None,
     brand_id: Optional[str] = None,
     gender: Optional[str] = None,
     limit: int = 50,
-    skip: int = 0
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
     query = {"is_active": True}
     if category:
@@ -384,33 +533,122 @@ async def get_products(
     if gender:
         query["gender"] = gender
     
-    products = await db.products.find(query).skip(skip).limit(limit).to_list(limit)
-    return [{**product, "_id": str(product["_id"])} for product in products]
+    products_cursor = db.products.find(paginate(query, cursor), projection(fields, PRODUCT_CARD)).sort(KEYSET_SORT)
+    if not cursor:
+        products_cursor = products_cursor.skip(skip)
+    products = await products_cursor.limit(limit).to_list(limit)
+    set_next_cursor(response, products, limit)
+    return [product_card(product) for product in products]
 
 @api_router.get("/products/trending")
 async def get_trending_products():
     # For now, return most recently added products
-    products = await db.products.find({"is_active": True}).sort("created_at", -1).limit(20).to_list(20)
-    return [{**product, "_id": str(product["_id"])} for product in products]
+    async def load_trending():
+        products = await db.products.find({"is_active": True}).sort("created_at", -1).limit(20).to_list(20)
+        return [product_card(product) for product in products]
+    
+    return await catalog_cache.get_or_load("products:trending", load_trending)
 
 @api_router.get("/products/new-arrivals")
 async def get_new_arrivals():
-    products = await db.products.find({"is_active": True}).sort("created_at", -1).limit(20).to_list(20)
-    return [{**product, "_id": str(product["_id"])} for product in products]
+    async def load_new_arrivals():
+        products = await db.products.find({"is_active": True}).sort("created_at", -1).limit(20).to_list(20)
+        return [product_card(product) for product in products]
+    
+    return await catalog_cache.get_or_load("products:new-arrivals", load_new_arrivals)
+
+@api_router.get("/products/search")
+async def search_products(
+    q: str,
+    category: Optional[str] = None,
+    brand_id: Optional[str] = None,
+    gender: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sizes: Optional[str] = None,
+    colors: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    skip: int = Query(0, ge=0)
+):
+    """Relevance-ranked text search with filters and facet counts from a single aggregation"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search query is required")
+    
+    # $text must sit in the first $match; is_active is the text index's equality prefix
+    match = {"$text": {"$search": q}, "is_active": True}
+    if category:
+        match["category"] = category
+    if brand_id:
+        match["brand_id"] = brand_id
+    if gender:
+        match["gender"] = gender
+    if min_price is not None or max_price is not None:
+        match["price"] = {}
+        if min_price is not None:
+            match["price"]["$gte"] = min_price
+        if max_price is not None:
+            match["price"]["$lte"] = max_price
+    if sizes:
+        match["sizes"] = {"$in": [size.strip() for size in sizes.split(",") if size.strip()]}
+    if colors:
+        match["colors"] = {"$in": [color.strip() for color in colors.split(",") if color.strip()]}
+    
+    pipeline = [
+        {"$match": match},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+        {"$facet": {
+            "results": [
+                {"$sort": {"score": -1, "_id": -1}},
+                {"$skip": skip},
+                {"$limit": limit},
+                {"$project": PRODUCT_SEARCH_CARD}
+            ],
+            "total": [{"$count": "count"}],
+            "categories": [{"$sortByCount": "$category"}],
+            "brands": [{"$sortByCount": "$brand_id"}],
+            "genders": [{"$sortByCount": "$gender"}],
+            "sizes": [{"$unwind": "$sizes"}, {"$sortByCount": "$sizes"}],
+            "colors": [{"$unwind": "$colors"}, {"$sortByCount": "$colors"}],
+            "price": [{"$group": {"_id": None, "min": {"$min": "$price"}, "max": {"$max": "$price"}}}]
+        }}
+    ]
+    result = (await db.products.aggregate(pipeline).to_list(1))[0]
+    
+    def counts(rows):
+        return [{"value": row["_id"], "count": row["count"]} for row in rows if row["_id"] is not None]
+    
+    price = result["price"][0] if result["price"] else {"min": None, "max": None}
+    return {
+        "results": [product_card(product) for product in result["results"]],
+        "total": result["total"][0]["count"] if result["total"] else 0,
+        "facets": {
+            "categories": counts(result["categories"]),
+            "brands": counts(result["brands"]),
+            "genders": counts(result["genders"]),
+            "sizes": counts(result["sizes"]),
+            "colors": counts(result["colors"]),
+            "price": {"min": price["min"], "max": price["max"]}
+        }
+    }
 
 @api_router.get("/products/{product_id}")
 async def get_product(product_id: str):
-    try:
+    async def load_product():
         product = await db.products.find_one({"_id": ObjectId(product_id)})
+        return {**product, "_id": str(product["_id"])} if product else None
+    
+    try:
+        product = await catalog_cache.get_or_load(f"product:{product_id}", load_product)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
-        return {**product, "_id": str(product["_id"])}
+        return product
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid product ID")
 
 @api_router.post("/products")
-async def create_product(product_data: ProductCreate, current_user: dict = Depends(get_admin_user)):
+async def create_product(product_data: ProductCreate, request: Request, current_user: dict = Depends(get_admin_user)):
     product_dict = product_data.dict()
+    await externalize_media(request, product_dict, ["images"])
     product_dict.update({
         "is_active": True,
         "created_at": datetime.utcnow(),
@@ -418,12 +656,14 @@ async def create_product(product_data: ProductCreate, current_user: dict = Depen
     })
     
     result = await db.products.insert_one(product_dict)
+    await invalidate_product_cache()
     return {"id": str(result.inserted_id), "message": "Product created successfully"}
 
 @api_router.put("/products/{product_id}")
-async def update_product(product_id: str, product_data: ProductUpdate, current_user: dict = Depends(get_admin_user)):
+async def update_product(product_id: str, product_data: ProductUpdate, request: Request, current_user: dict = Depends(get_admin_user)):
     try:
         update_dict = {k: v for k, v in product_data.dict().items() if v is not None}
+        await externalize_media(request, update_dict, ["images"])
         update_dict["updated_at"] = datetime.utcnow()
         
         result = await db.products.update_one(
@@ -433,6 +673,7 @@ async def update_product(product_id: str, product_data: ProductUpdate, current_u
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Product not found")
+        await invalidate_product_cache(product_id)
         
         return {"message": "Product updated successfully"}
     except HTTPException:
@@ -446,109 +687,177 @@ async def delete_product(product_id: str, current_user: dict = Depends(get_admin
         result = await db.products.delete_one({"_id": ObjectId(product_id)})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Product not found")
+        await invalidate_product_cache(product_id)
         return {"message": "Product deleted successfully"}
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid product ID")
 
 # Posts Routes
-@api_router.get("/posts/feed")
-async def get_feed(limit: int = 20, skip: int = 0):
-    posts = await db.posts.find().sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+def feed_projection(fields: Optional[str]) -> Optional[dict]:
+    post_projection = projection(fields, POST_CARD)
+    if post_projection is not None:
+        # Authors and counts are always returned, whatever fields were asked for
+        post_projection = {**post_projection, "user_id": 1, **POST_COUNTS}
+    return post_projection
+
+async def with_authors(posts: List[dict]) -> List[dict]:
+    # Enrich with user data, resolving all authors in a single query
+    author_ids = list({ObjectId(post["user_id"]) for post in posts})
+    authors = await db.users.find(
+        {"_id": {"$in": author_ids}},
+        {"name": 1, "profile_photo": 1, "is_verified": 1}
+    ).to_list(len(author_ids))
+    authors_by_id = {str(author["_id"]): author for author in authors}
     
-    # Enrich with user data
     result = []
     for post in posts:
-        user = await db.users.find_one({"_id": ObjectId(post["user_id"])})
+        user = authors_by_id.get(post["user_id"])
         result.append({
             **post,
             "_id": str(post["_id"]),
             "user": {
                 "id": str(user["_id"]),
                 "name": user["name"],
-                "profile_photo": user.get("profile_photo"),
+                "profile_photo": variant_url(user.get("profile_photo"), "avatar"),
                 "is_verified": user.get("is_verified", False)
             } if user else None,
-            "likes_count": len(post.get("likes", [])),
-            "comments_count": len(post.get("comments", []))
+            "likes_count": post.get("likes_count", 0),
+            "comments_count": post.get("comments_count", 0)
         })
     
     return result
 
+@api_router.get("/posts/feed")
+async def get_feed(response: Response, limit: int = 20, skip: int = 0, cursor: Optional[str] = None, fields: Optional[str] = None):
+    posts_cursor = db.posts.find(paginate({}, cursor), feed_projection(fields)).sort(KEYSET_SORT)
+    if not cursor:
+        posts_cursor = posts_cursor.skip(skip)
+    posts = await posts_cursor.limit(limit).to_list(limit)
+    set_next_cursor(response, posts, limit)
+    return await with_authors(posts)
+
+@api_router.get("/posts/feed/following")
+async def get_following_feed(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Posts by the people the current user follows, read from their precomputed timeline"""
+    post_projection = feed_projection(fields)
+    try:
+        posts = await timelines.read(str(current_user["_id"]), limit, cursor, post_projection)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    set_next_cursor(response, posts, limit)
+    return await with_authors(posts)
+
 @api_router.post("/posts")
-async def create_post(post_data: PostCreate, current_user: dict = Depends(get_current_user)):
+async def create_post(post_data: PostCreate, request: Request, current_user: dict = Depends(get_current_user)):
     # Check if user is verified influencer for product tagging
     if post_data.tagged_products and not current_user.get("is_verified"):
         raise HTTPException(status_code=403, detail="Only verified influencers can tag products")
     
     post_dict = post_data.dict()
+    await externalize_media(request, post_dict, ["media"])
     post_dict.update({
         "user_id": str(current_user["_id"]),
-        "likes": [],
-        "comments": [],
+        "likes_count": 0,
+        "comments_count": 0,
         "views_count": 0,
         "created_at": datetime.utcnow()
     })
     
     result = await db.posts.insert_one(post_dict)
+    await timelines.fan_out(post_dict, current_user)
     return {"id": str(result.inserted_id), "message": "Post created successfully"}
 
 @api_router.post("/posts/{post_id}/like")
 async def like_post(post_id: str, current_user: dict = Depends(get_current_user)):
     try:
+        post_oid = ObjectId(post_id)
         user_id = str(current_user["_id"])
-        post = await db.posts.find_one({"_id": ObjectId(post_id)})
+        now = datetime.utcnow()
+        
+        # Flip the like edge in one atomic upsert; concurrent taps serialize on the unique index
+        like = await db.post_likes.find_one_and_update(
+            {"post_id": post_id, "user_id": user_id},
+            [{"$set": {
+                "liked": {"$ne": ["$liked", True]},
+                "created_at": {"$ifNull": ["$created_at", now]},
+                "updated_at": now
+            }}],
+            projection={"liked": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        liked = like["liked"]
         
+        post = await db.posts.find_one_and_update(
+            {"_id": post_oid},
+            {"$inc": {"likes_count": 1 if liked else -1}},
+            projection={"likes_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
         if not post:
+            await db.post_likes.delete_one({"_id": like["_id"]})
             raise HTTPException(status_code=404, detail="Post not found")
         
-        likes = post.get("likes", [])
-        if user_id in likes:
-            # Unlike
-            await db.posts.update_one(
-                {"_id": ObjectId(post_id)},
-                {"$pull": {"likes": user_id}}
-            )
-            return {"message": "Post unliked", "liked": False}
-        else:
-            # Like
-            await db.posts.update_one(
-                {"_id": ObjectId(post_id)},
-                {"$addToSet": {"likes": user_id}}
-            )
-            return {"message": "Post liked", "liked": True}
+        return {
+            "message": "Post liked" if liked else "Post unliked",
+            "liked": liked,
+            "likes_count": post["likes_count"]
+        }
+    except HTTPException:
+        raise
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid post ID")
 
 @api_router.post("/posts/{post_id}/comment")
 async def comment_on_post(post_id: str, comment_data: CommentCreate, current_user: dict = Depends(get_current_user)):
     try:
+        result = await db.posts.update_one(
+            {"_id": ObjectId(post_id)},
+            {"$inc": {"comments_count": 1}}
+        )
+        if result.matched_count == 0:
+            raise HTTPException(status_code=404, detail="Post not found")
+        
         comment = {
+            "post_id": post_id,
             "user_id": str(current_user["_id"]),
             "user_name": current_user["name"],
             "content": comment_data.content,
             "created_at": datetime.utcnow()
         }
+        comment_result = await db.post_comments.insert_one(comment)
         
-        await db.posts.update_one(
-            {"_id": ObjectId(post_id)},
-            {"$push": {"comments": comment}}
-        )
-        
-        return {"message": "Comment added successfully"}
+        return {"id": str(comment_result.inserted_id), "message": "Comment added successfully"}
+    except HTTPException:
+        raise
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid post ID")
 
+@api_router.get("/posts/{post_id}/comments")
+async def get_post_comments(response: Response, post_id: str, limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None):
+    if not ObjectId.is_valid(post_id):
+        raise HTTPException(status_code=400, detail="Invalid post ID")
+    
+    comments = await db.post_comments.find(
+        paginate({"post_id": post_id}, cursor),
+        {"post_id": 0}
+    ).sort(KEYSET_SORT).limit(limit).to_list(limit)
+    set_next_cursor(response, comments, limit)
+    return [{**comment, "_id": str(comment["_id"])} for comment in comments]
+
 # Order Routes
 @api_router.post("/orders/create-payment")
 async def create_payment_order(order_data: OrderCreate, current_user: dict = Depends(get_current_user)):
     """Create Razorpay payment order"""
     try:
         amount = int(order_data.total_amount * 100)  # Convert to paise
-        payment_order = razorpay_client.order.create({
-            "amount": amount,
-            "currency": "INR",
-            "payment_capture": 1
-        })
+        payment_order = await payment_gateway.create_order(amount, currency="INR", payment_capture=1)
         
         return {
             "order_id": payment_order["id"],
@@ -556,6 +865,8 @@ async def create_payment_order(order_data: OrderCreate, current_user: dict = Dep
             "currency": payment_order["currency"],
             "razorpay_key": os.getenv("RAZORPAY_KEY_ID")
         }
+    except CircuitBreakerOpen:
+        raise HTTPException(status_code=503, detail="Payment service temporarily unavailable, please retry shortly")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Payment order creation failed: {str(e)}")
 
@@ -573,8 +884,9 @@ async def create_order(order_data: OrderCreate, razorpay_payment_id: Optional[st
     
     result = await db.orders.insert_one(order_dict)
     order_id = str(result.inserted_id)
+    await daily_stats.record_order(order_dict)
     
-    # Send order confirmation email
+    # Queue order confirmation email
     try:
         order_data_email = {
             "order_id": order_id,
@@ -582,15 +894,18 @@ async def create_order(order_data: OrderCreate, razorpay_payment_id: Optional[st
             "total_amount": order_data.total_amount,
             "status": order_dict["status"]
         }
-        await email_service.send_order_confirmation(order_data_email, current_user["email"])
+        await email_outbox.enqueue("order_confirmation", order_data_email, current_user["email"])
     except Exception as e:
-        print(f"Email sending failed: {e}")
+        logger.error(f"Queueing order confirmation email failed: {e}")
     
     return {"id": order_id, "message": "Order placed successfully", "order_id": order_id}
 
 @api_router.get("/orders/my-orders")
-async def get_my_orders(current_user: dict = Depends(get_current_user)):
-    orders = await db.orders.find({"user_id": str(current_user["_id"])}).sort("created_at", -1).to_list(100)
+async def get_my_orders(fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    orders = await db.orders.find(
+        {"user_id": str(current_user["_id"])},
+        projection(fields, ORDER_CARD)
+    ).sort("created_at", -1).to_list(100)
     return [{**order, "_id": str(order["_id"])} for order in orders]
 
 @api_router.get("/orders/{order_id}")
@@ -611,33 +926,35 @@ async def get_order(order_id: str, current_user: dict = Depends(get_current_user
         raise HTTPException(status_code=400, detail="Invalid order ID")
 
 @api_router.get("/orders")
-async def get_all_orders(current_user: dict = Depends(get_admin_user)):
-    orders = await db.orders.find().sort("created_at", -1).to_list(1000)
+async def get_all_orders(response: Response, limit: int = 1000, cursor: Optional[str] = None, current_user: dict = Depends(get_admin_user)):
+    orders = await db.orders.find(paginate({}, cursor)).sort(KEYSET_SORT).limit(limit).to_list(limit)
+    set_next_cursor(response, orders, limit)
     return [{**order, "_id": str(order["_id"])} for order in orders]
 
 @api_router.put("/orders/{order_id}/status")
 async def update_order_status(order_id: str, status: str = Body(..., embed=True), current_user: dict = Depends(get_admin_user)):
     try:
-        result = await db.orders.update_one(
+        order = await db.orders.find_one_and_update(
             {"_id": ObjectId(order_id)},
-            {"$set": {"status": status, "updated_at": datetime.utcnow()}}
+            {"$set": {"status": status, "updated_at": datetime.utcnow()}},
+            projection={"user_id": 1, "status": 1, "created_at": 1}
         )
         
-        if result.matched_count == 0:
+        if not order:
             raise HTTPException(status_code=404, detail="Order not found")
+        await daily_stats.record_status_change(order, status)
         
-        # Send status update email
+        # Queue status update email
         try:
-            order = await db.orders.find_one({"_id": ObjectId(order_id)})
-            user = await db.users.find_one({"_id": ObjectId(order["user_id"])})
+            user = await db.users.find_one({"_id": ObjectId(order["user_id"])}, {"email": 1})
             if user:
                 order_data_email = {
                     "order_id": order_id,
                     "status": status
                 }
-                await email_service.send_order_status_update(order_data_email, user["email"])
+                await email_outbox.enqueue("order_status_update", order_data_email, user["email"])
         except Exception as e:
-            print(f"Email sending failed: {e}")
+            logger.error(f"Queueing order status email failed: {e}")
         
         return {"message": "Order status updated successfully"}
     except HTTPException:
@@ -647,31 +964,55 @@ async def update_order_status(order_id: str, status: str = Body(..., embed=True)
 
 # Image Upload Route
 @api_router.post("/upload/image")
-async def upload_image(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
-    """Upload image and return base64 encoded string"""
+async def upload_image(request: Request, file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+    """Stream an image into the media store and return its URL plus resized variants"""
     try:
-        contents = await file.read()
-        base64_encoded = base64.b64encode(contents).decode('utf-8')
         mime_type = file.content_type or 'image/jpeg'
+        stored = await media_storage.save_upload(file, mime_type)
+        base_url = f"{request.base_url}api/media"
         return {
             "success": True,
-            "image": f"data:{mime_type};base64,{base64_encoded}"
+            "image": media_storage.url(stored["key"], base_url),
+            "key": stored["key"],
+            "size": stored["size"],
+            "variants": {name: media_storage.url(key, base_url) for name, key in stored["variants"].items()}
         }
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Image exceeds the {media_storage.max_upload_bytes / (1024 * 1024):.1f} MB upload limit"
+        )
+    except UnsupportedMediaType:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Only JPEG, PNG, WebP and GIF images can be uploaded"
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Image upload failed: {str(e)}")
 
+@api_router.api_route("/media/{key:path}", methods=["GET", "HEAD"])
+async def get_media(key: str, request: Request):
+    """Serve a locally stored blob with a content-hash ETag, Range support and immutable caching"""
+    if not media_storage.is_local:
+        raise HTTPException(status_code=404, detail="Media not found")
+    try:
+        path = media_storage.backend.path(key)
+        return media_response(request, path, key, media_storage.backend.content_type(key))
+    except (InvalidMediaKey, FileNotFoundError):
+        raise HTTPException(status_code=404, detail="Media not found")
+
 # Wishlist Routes
 @api_router.get("/wishlist")
-async def get_wishlist(current_user: dict = Depends(get_current_user)):
+async def get_wishlist(fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     wishlist = await db.wishlists.find_one({"user_id": str(current_user["_id"])})
     if not wishlist:
         return {"products": []}
     
     # Get product details
     product_ids = [ObjectId(pid) for pid in wishlist.get("product_ids", [])]
-    products = await db.products.find({"_id": {"$in": product_ids}}).to_list(100)
+    products = await db.products.find({"_id": {"$in": product_ids}}, projection(fields, PRODUCT_CARD)).to_list(100)
     
-    return {"products": [{**product, "_id": str(product["_id"])} for product in products]}
+    return {"products": [product_card(product) for product in products]}
 
 @api_router.post("/wishlist/add/{product_id}")
 async def add_to_wishlist(product_id: str, current_user: dict = Depends(get_current_user)):
@@ -708,36 +1049,63 @@ async def remove_from_wishlist(product_id: str, current_user: dict = Depends(get
 
 # Admin Routes
 @api_router.get("/admin/analytics")
-async def get_analytics(current_user: dict = Depends(get_admin_user)):
-    users_count = await db.users.count_documents({})
-    influencers_count = await db.users.count_documents({"is_verified": True})
-    brands_count = await db.brands.count_documents({"status": "approved"})
-    products_count = await db.products.count_documents({"is_active": True})
-    orders_count = await db.orders.count_documents({})
+async def get_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: Optional[str] = None,
+    current_user: dict = Depends(get_admin_user)
+):
+    if granularity and granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of: {', '.join(GRANULARITIES)}")
     
-    # Calculate total revenue
-    orders = await db.orders.find({"payment_status": "completed"}).to_list(10000)
-    total_revenue = sum(order.get("total_amount", 0) for order in orders)
+    # Users, orders and revenue come from the daily_stats rollups; the small catalog counts stay live
+    brands_count, products_count, stats = await asyncio.gather(
+        db.brands.count_documents({"status": "approved"}),
+        db.products.count_documents({"is_active": True}),
+        daily_stats.summary(start, end, granularity)
+    )
+    all_time = stats["all_time"]
     
-    return {
-        "users_count": users_count,
-        "influencers_count": influencers_count,
+    analytics = {
+        "users_count": all_time["signups"],
+        "influencers_count": all_time["influencers"],
         "brands_count": brands_count,
         "products_count": products_count,
-        "orders_count": orders_count,
-        "total_revenue": total_revenue
+        "orders_count": all_time["orders"],
+        "orders_by_status": all_time["orders_by_status"],
+        "total_revenue": all_time["revenue"]
+    }
+    if "range" in stats:
+        analytics["range"] = {"start": start, "end": end, **stats["range"]}
+    if "series" in stats:
+        analytics["series"] = stats["series"]
+    return analytics
+
+@api_router.get("/admin/metrics")
+async def get_metrics(current_user: dict = Depends(get_admin_user)):
+    return {
+        "password_hashing": password_hasher.stats(),
+        "user_cache": user_cache.stats(),
+        "catalog_cache": catalog_cache.stats(),
+        "email_outbox": await email_outbox.stats(),
+        "payment_gateway": payment_gateway.stats()
     }
 
 @api_router.put("/admin/verify-influencer/{user_id}")
 async def verify_influencer(user_id: str, current_user: dict = Depends(get_admin_user)):
     try:
-        result = await db.users.update_one(
+        now = datetime.utcnow()
+        user = await db.users.find_one_and_update(
             {"_id": ObjectId(user_id)},
-            {"$set": {"is_verified": True, "role": "influencer"}}
+            {"$set": {"is_verified": True, "role": "influencer", "verified_at": now}},
+            projection={"is_verified": 1}
         )
         
-        if result.matched_count == 0:
+        if not user:
             raise HTTPException(status_code=404, detail="User not found")
+        user_cache.invalidate(user_id)
+        if not user.get("is_verified"):
+            await daily_stats.record_influencer(now, 1)
         
         return {"message": "User verified as influencer"}
     except HTTPException:
@@ -755,6 +1123,7 @@ async def ban_user(user_id: str, current_user: dict = Depends(get_admin_user)):
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
+        user_cache.invalidate(user_id)
         
         return {"message": "User banned successfully"}
     except HTTPException:
@@ -773,6 +1142,7 @@ async def unban_user(user_id: str, current_user: dict = Depends(get_admin_user))
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
+        user_cache.invalidate(user_id)
         
         return {"message": "User unbanned successfully"}
     except HTTPException:
@@ -783,13 +1153,17 @@ async def unban_user(user_id: str, current_user: dict = Depends(get_admin_user))
 @api_router.put("/admin/unverify-influencer/{user_id}")
 async def unverify_influencer(user_id: str, current_user: dict = Depends(get_admin_user)):
     try:
-        result = await db.users.update_one(
+        user = await db.users.find_one_and_update(
             {"_id": ObjectId(user_id)},
-            {"$set": {"is_verified": False, "role": "user"}}
+            {"$set": {"is_verified": False, "role": "user"}},
+            projection={"is_verified": 1}
         )
         
-        if result.matched_count == 0:
+        if not user:
             raise HTTPException(status_code=404, detail="User not found")
+        user_cache.invalidate(user_id)
+        if user.get("is_verified"):
+            await daily_stats.record_influencer(datetime.utcnow(), -1)
         
         return {"message": "Influencer status removed"}
     except HTTPException:
@@ -798,8 +1172,9 @@ async def unverify_influencer(user_id: str, current_user: dict = Depends(get_adm
         raise HTTPException(status_code=400, detail="Invalid user ID")
 
 @api_router.get("/admin/users")
-async def get_all_users(current_user: dict = Depends(get_admin_user)):
-    users = await db.users.find().to_list(1000)
+async def get_all_users(response: Response, limit: int = 1000, cursor: Optional[str] = None, current_user: dict = Depends(get_admin_user)):
+    users = await db.users.find(paginate({}, cursor)).sort(KEYSET_SORT).limit(limit).to_list(limit)
+    set_next_cursor(response, users, limit)
     return [{
         "id": str(user["_id"]),
         "name": user["name"],
@@ -807,8 +1182,8 @@ async def get_all_users(current_user: dict = Depends(get_admin_user)):
         "role": user.get("role", "user"),
         "is_verified": user.get("is_verified", False),
         "is_banned": user.get("is_banned", False),
-        "followers_count": len(user.get("followers", [])),
-        "following_count": len(user.get("following", [])),
+        "followers_count": user.get("followers_count", 0),
+        "following_count": user.get("following_count", 0),
         "created_at": user.get("created_at")
     } for user in users]
 
@@ -829,6 +1204,7 @@ async def register_push_token(token_data: PushTokenRegister, current_user: dict
             {"_id": current_user["_id"]},
             {"$set": {"expo_push_token": token_data.expo_push_token}}
         )
+        user_cache.invalidate(current_user["_id"])
         return {"message": "Push token registered successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -839,84 +1215,75 @@ async def send_notification(
     current_user: dict = Depends(get_admin_user)
 ):
     try:
-        import requests
-        
-        # Get users to send notification to
-        if notification.user_ids:
-            users = await db.users.find(
-                {"_id": {"$in": [ObjectId(uid) for uid in notification.user_ids]}}
-            ).to_list(1000)
-        else:
-            users = await db.users.find().to_list(1000)
-        
-        # Collect expo push tokens
-        push_tokens = [
-            user.get("expo_push_token")
-            for user in users
-            if user.get("expo_push_token")
-        ]
-        
-        if not push_tokens:
-            return {"message": "No users with push tokens found", "sent_count": 0}
-        
-        # Prepare messages for Expo Push API
-        messages = []
-        for token in push_tokens:
-            messages.append({
-                "to": token,
-                "sound": "default",
-                "title": notification.title,
-                "body": notification.body,
-                "data": {"type": "admin_notification"}
-            })
-        
-        # Send to Expo Push API
-        response = requests.post(
-            "https://exp.host/--/api/v2/push/send",
-            json=messages,
-            headers={
-                "Accept": "application/json",
-                "Content-Type": "application/json"
-            }
+        job = await notification_jobs.enqueue(
+            notification.title,
+            notification.body,
+            notification.user_ids,
+            created_by=str(current_user["_id"])
         )
-        
-        if response.status_code == 200:
-            return {
-                "message": "Notifications sent successfully",
-                "sent_count": len(push_tokens),
-                "response": response.json()
-            }
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to send notifications: {response.text}"
-            )
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid user ID")
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    if job is None:
+        return {"message": "No users with push tokens found", "sent_count": 0}
+    
+    return {
+        "message": "Notification queued",
+        "job_id": str(job["_id"]),
+        "total_count": job["total"]
+    }
+
+@api_router.get("/admin/notifications/jobs/{job_id}")
+async def get_notification_job(job_id: str, current_user: dict = Depends(get_admin_user)):
+    try:
+        job = await notification_jobs.get(job_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid job ID")
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    processed = job["sent"] + job["failed"] + job.get("skipped", 0)
+    return {
+        "id": str(job["_id"]),
+        "title": job["title"],
+        "status": job["status"],
+        "total": job["total"],
+        "sent": job["sent"],
+        "failed": job["failed"],
+        "skipped": job.get("skipped", 0),
+        "remaining": 0 if job["status"] in ("completed", "failed") else max(job["total"] - processed, 0),
+        "attempts": job.get("attempts", 0),
+        "error": job.get("error"),
+        "created_at": job["created_at"],
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at")
+    }
 
 @api_router.get("/admin/notifications/stats")
 async def get_notification_stats(current_user: dict = Depends(get_admin_user)):
     total_users = await db.users.count_documents({})
-    users_with_tokens = await db.users.count_documents({"expo_push_token": {"$exists": True, "$ne": None}})
+    users_with_tokens = await db.users.count_documents({"expo_push_token": {"$exists": True, "$nin": [None, ""]}})
     
     return {
         "total_users": total_users,
         "users_with_notifications_enabled": users_with_tokens,
-        "coverage_percentage": round((users_with_tokens / total_users * 100) if total_users > 0 else 0, 2)
+        "coverage_percentage": round((users_with_tokens / total_users * 100) if total_users > 0 else 0, 2),
+        "pending_receipts": await push_receipt_checker.pending_receipts(),
+        "invalid_tokens_pruned": await push_receipt_checker.pruned_total()
     }
 
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(UploadSizeLimit, paths=["/api/upload/image"], max_upload_bytes=media_storage.max_upload_bytes)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Configure logging
@@ -926,6 +1293,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    try:
+        result = await ensure_indexes(db)
+        logger.info(f"Ensured {len(result['created'])} indexes ({len(result['failed'])} failed)")
+    except Exception as e:
+        logger.error(f"Index bootstrap failed: {e}")
+
+@app.on_event("startup")
+async def start_background_workers():
+    email_outbox.start(db)
+    push_dispatcher.start(db)
+    notification_jobs.start(db)
+    timelines.start(db)
+    daily_stats.start(db)
+    push_receipt_checker.start(db)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await email_outbox.stop()
+    await notification_jobs.stop()
+    await timelines.stop()
+    await daily_stats.stop()
+    await push_receipt_checker.stop()
+    await email_service.close()
+    await payment_gateway.close()
+    await push_dispatcher.close()
     client.close()
+    password_hasher.shutdown()
+    media_storage.shutdown()
@@ -5,6 +5,7 @@ from datetime import datetime
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from daily_stats import daily_stats
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -37,12 +38,16 @@ async def setup_initial_data():
             "style_preferences": [],
             "role": "admin",
             "is_verified": True,
-            "followers": [],
-            "following": [],
+            "followers_count": 0,
+            "following_count": 0,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
         await db.users.insert_one(admin)
+        # Count the admin in the analytics rollups as a verified signup, as a backfill would
+        daily_stats.start(db)
+        await daily_stats.record_signup(admin["created_at"])
+        await daily_stats.record_influencer(admin["created_at"], 1)
         print(f"✓ Admin user created ({admin_email} / {admin_password})")
     else:
         print("✓ Admin user already exists")
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import datetime
+from typing import List, Optional
+from pymongo.errors import BulkWriteError
+from leased_jobs import LeasedJobQueue
+from pagination import KEYSET_SORT, keyset_query
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_SORT = [("created_at", -1), ("post_id", -1)]
+
+
+class TimelineStore(LeasedJobQueue):
+    """Per-user home timelines for the following feed.
+
+    New posts are fanned out on write into the ``timelines`` collection, one
+    ``{user_id, post_id, author_id, created_at}`` entry per follower, so reading
+    a feed is a range scan on ``(user_id, created_at, post_id)``. Authors with
+    at least ``TIMELINE_FANOUT_MAX_FOLLOWERS`` followers are skipped on write
+    and their posts are merged in when the feed is read instead.
+
+    Fan-out runs as a leased job in ``timeline_jobs``, checkpointed by
+    follower, so a post survives a crash or redeploy.
+    Timelines are capped at their newest ``TIMELINE_MAX_ENTRIES`` entries;
+    older posts drop out of the feed. The cap is enforced where entries are
+    written: on a follow, and for about one in ``TIMELINE_TRIM_EVERY``
+    followers of each fanned-out post, so a timeline overshoots it briefly
+    by roughly that many entries.
+    """
+
+    name = "Timeline fan-out"
+
+    def __init__(self):
+        super().__init__("TIMELINE_JOB", max_attempts=5)
+        self.max_fanout_followers = int(os.getenv("TIMELINE_FANOUT_MAX_FOLLOWERS", 10000))
+        self.batch_size = int(os.getenv("TIMELINE_FANOUT_BATCH_SIZE", 1000))
+        self.backfill_size = int(os.getenv("TIMELINE_BACKFILL_SIZE", 20))
+        self.mega_authors_ttl = float(os.getenv("TIMELINE_MEGA_AUTHORS_TTL_SECONDS", 60))
+        self.max_entries = int(os.getenv("TIMELINE_MAX_ENTRIES", 800))
+        self.trim_every = int(os.getenv("TIMELINE_TRIM_EVERY", 20))
+        self.db = None
+        self._mega_authors = None
+        self._mega_authors_loaded_at = 0.0
+
+    def start(self, db):
+        self.db = db
+        self.start_workers(db.timeline_jobs)
+
+    def is_mega(self, author: dict) -> bool:
+        return author.get("followers_count", 0) >= self.max_fanout_followers
+
+    async def _insert(self, entries: List[dict]):
+        try:
+            await self.db.timelines.insert_many(entries, ordered=False)
+        except BulkWriteError:
+            # Entries already written by an earlier attempt
+            pass
+
+    async def _trim(self, user_id: str):
+        """Delete a user's timeline entries past the newest max_entries, walking the timeline index"""
+        first_dropped = await self.db.timelines.find(
+            {"user_id": user_id},
+            {"_id": 0, "created_at": 1, "post_id": 1}
+        ).sort(TIMELINE_SORT).skip(self.max_entries).limit(1).to_list(1)
+        if not first_dropped:
+            return
+        cutoff = first_dropped[0]
+        await self.db.timelines.delete_many({
+            "user_id": user_id,
+            "$or": [
+                {"created_at": {"$lt": cutoff["created_at"]}},
+                {"created_at": cutoff["created_at"], "post_id": {"$lte": cutoff["post_id"]}}
+            ]
+        })
+
+    async def fan_out(self, post: dict, author: dict):
+        """Put the post in its author's timeline and queue it for their followers'"""
+        # Authors see their own posts in their feed
+        await self._insert([{
+            "user_id": post["user_id"],
+            "post_id": post["_id"],
+            "author_id": post["user_id"],
+            "created_at": post["created_at"]
+        }])
+        if random.random() * self.trim_every < 1:
+            await self._trim(post["user_id"])
+        if self.is_mega(author):
+            # Followers read these posts on demand
+            return
+        now = datetime.utcnow()
+        await self.collection.insert_one({
+            "post_id": post["_id"],
+            "author_id": post["user_id"],
+            "post_created_at": post["created_at"],
+            "status": "queued",
+            "attempts": 0,
+            "checkpoint": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        })
+        self.wake()
+
+    async def process(self, job: dict):
+        """Insert the post for every follower past the job's checkpoint, batch by batch.
+
+        Re-inserting a batch after a crash is harmless: the unique timeline
+        index rejects the duplicates.
+        """
+        author_id = job["author_id"]
+        entry = {"post_id": job["post_id"], "author_id": author_id, "created_at": job["post_created_at"]}
+        checkpoint = job.get("checkpoint")
+        while True:
+            query = {"followee_id": author_id}
+            if checkpoint is not None:
+                query["follower_id"] = {"$gt": checkpoint}
+            edges = await self.db.follows.find(query, {"follower_id": 1}).sort("follower_id", 1).limit(self.batch_size).to_list(self.batch_size)
+            if not edges:
+                break
+            await self._insert([{**entry, "user_id": edge["follower_id"]} for edge in edges])
+            # A sample of each batch keeps every timeline near the cap without a query per follower
+            await asyncio.gather(*[
+                self._trim(edge["follower_id"]) for edge in edges if random.random() * self.trim_every < 1
+            ])
+            checkpoint = edges[-1]["follower_id"]
+            await self.collection.update_one(
+                {"_id": job["_id"]},
+                {"$set": {"checkpoint": checkpoint, **self.lease_fields()}}
+            )
+        # Finished jobs have nothing left to audit
+        await self.collection.delete_one({"_id": job["_id"]})
+
+    async def backfill(self, user_id: str, author: dict):
+        """Copy an author's recent posts into a new follower's timeline"""
+        if self.is_mega(author):
+            return
+        author_id = str(author["_id"])
+        posts = await self.db.posts.find({"user_id": author_id}, {"created_at": 1}).sort(KEYSET_SORT).limit(self.backfill_size).to_list(self.backfill_size)
+        if posts:
+            await self._insert([
+                {"user_id": user_id, "post_id": post["_id"], "author_id": author_id, "created_at": post["created_at"]}
+                for post in posts
+            ])
+            await self._trim(user_id)
+
+    async def remove_author(self, user_id: str, author_id: str):
+        await self.db.timelines.delete_many({"user_id": user_id, "author_id": author_id})
+
+    async def mega_authors(self) -> List[str]:
+        if self._mega_authors is None or time.monotonic() - self._mega_authors_loaded_at > self.mega_authors_ttl:
+            authors = await self.db.users.find(
+                {"followers_count": {"$gte": self.max_fanout_followers}},
+                {"_id": 1}
+            ).to_list(None)
+            self._mega_authors = [str(author["_id"]) for author in authors]
+            self._mega_authors_loaded_at = time.monotonic()
+        return self._mega_authors
+
+    async def read(self, user_id: str, limit: int, cursor: Optional[str], projection: Optional[dict] = None) -> List[dict]:
+        """One page of a user's following feed, newest first.
+
+        The precomputed timeline and posts by followed mega-authors are each
+        read up to ``limit`` past the cursor, then merged; the top ``limit`` of
+        the union is always within those two slices.
+        """
+        entries = await self.db.timelines.find(
+            keyset_query({"user_id": user_id}, cursor, id_field="post_id"),
+            {"post_id": 1}
+        ).sort(TIMELINE_SORT).limit(limit).to_list(limit)
+        posts = await self.db.posts.find({"_id": {"$in": [entry["post_id"] for entry in entries]}}, projection).to_list(limit)
+
+        mega_authors = await self.mega_authors()
+        if mega_authors:
+            followed = await self.db.follows.find(
+                {"follower_id": user_id, "followee_id": {"$in": mega_authors}},
+                {"followee_id": 1}
+            ).to_list(len(mega_authors))
+            if followed:
+                posts += await self.db.posts.find(
+                    keyset_query({"user_id": {"$in": [edge["followee_id"] for edge in followed]}}, cursor),
+                    projection
+                ).sort(KEYSET_SORT).limit(limit).to_list(limit)
+
+        unique = {post["_id"]: post for post in posts}
+        merged = sorted(unique.values(), key=lambda post: (post["created_at"], post["_id"]), reverse=True)
+        return merged[:limit]
+
+timelines = TimelineStore()
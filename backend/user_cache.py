@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Slim projection used by the auth dependency. Follows live in the ``follows``
+# collection; users only carry their denormalized counters.
+USER_AUTH_PROJECTION = {
+    "email": 1,
+    "name": 1,
+    "role": 1,
+    "bio": 1,
+    "gender": 1,
+    "profile_photo": 1,
+    "is_verified": 1,
+    "is_banned": 1,
+    "expo_push_token": 1,
+    "followers_count": 1,
+    "following_count": 1,
+}
+
+
+class UserCache:
+    """In-process TTL + LRU cache of slim user documents keyed by user id"""
+
+    def __init__(self):
+        self.ttl = float(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+        self.max_size = int(os.getenv("USER_CACHE_MAX_SIZE", 10000))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return dict(entry[1])
+
+    def set(self, user_id: str, user: dict):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, dict(user))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+user_cache = UserCache()
@@ -13,17 +13,21 @@ from typing import Dict, Any, Optional
 BASE_URL = "https://skyriting-app.preview.emergentagent.com/api"
 ADMIN_EMAIL = "aniketh0701@gmail.com"
 ADMIN_PASSWORD = "Admin@123"
+# 1x1 PNG; uploads must be images the server can decode
+TEST_IMAGE = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg=="
 
 class SkyratingAPITester:
     def __init__(self):
         self.base_url = BASE_URL
         self.admin_token = None
+        self.admin_user_id = None
         self.user_token = None
         self.test_user_id = None
         self.test_brand_id = None
         self.test_product_id = None
         self.test_order_id = None
         self.test_post_id = None
+        self.test_notification_job_id = None
         self.results = {
             "passed": 0,
             "failed": 0,
@@ -126,6 +130,7 @@ class SkyratingAPITester:
         success, response, status_code = self.make_request("GET", "/auth/me", token=self.admin_token)
         
         if success and "email" in response and response["email"] == ADMIN_EMAIL:
+            self.admin_user_id = response["id"]
             self.log_result("Auth - Get Admin Info", True, f"Admin info retrieved successfully")
             return True
         else:
@@ -218,7 +223,7 @@ class SkyratingAPITester:
             "subcategory": "tops",
             "colors": ["red", "blue"],
             "sizes": ["S", "M", "L"],
-            "images": ["data:image/jpeg;base64,/9j/4AAQSkZJRgABAQEAYABgAAD/2wBDAAEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQH/2wBDAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQH/wAARCAABAAEDASIAAhEBAxEB/8QAFQABAQAAAAAAAAAAAAAAAAAAAAv/xAAUEAEAAAAAAAAAAAAAAAAAAAAA/8QAFQEBAQAAAAAAAAAAAAAAAAAAAAX/xAAUEQEAAAAAAAAAAAAAAAAAAAAA/9oADAMBAAIRAxEAPwA/8A"],
+            "images": [TEST_IMAGE],
             "gender": "unisex"
         }
         
@@ -258,6 +263,47 @@ class SkyratingAPITester:
             self.log_result("Products - Create (User Forbidden)", False, f"Expected 403, got {status_code}: {response}")
             return False
 
+    def test_products_cursor_pagination(self):
+        """Test keyset pagination via the X-Next-Cursor header"""
+        try:
+            first = requests.get(f"{self.base_url}/products", params={"limit": 2}, timeout=30)
+            next_cursor = first.headers.get("X-Next-Cursor")
+            if first.status_code != 200:
+                self.log_result("Products - Cursor Pagination", False, f"Status: {first.status_code}, Response: {first.text}")
+                return False
+            if not next_cursor:
+                self.log_result("Products - Cursor Pagination", True, f"Single page of {len(first.json())} products")
+                return True
+            
+            second = requests.get(f"{self.base_url}/products", params={"limit": 2, "cursor": next_cursor}, timeout=30)
+            first_ids = {product["_id"] for product in first.json()}
+            second_ids = {product["_id"] for product in second.json()}
+            
+            if second.status_code == 200 and not first_ids & second_ids:
+                self.log_result("Products - Cursor Pagination", True, f"Page 2 returned {len(second_ids)} new products")
+                return True
+            else:
+                self.log_result("Products - Cursor Pagination", False, f"Status: {second.status_code}, overlapping pages")
+                return False
+        except Exception as e:
+            self.log_result("Products - Cursor Pagination", False, f"Request failed: {str(e)}")
+            return False
+
+    def test_product_search(self):
+        """Test text search with facet counts"""
+        success, response, status_code = self.make_request("GET", "/products/search?q=test&max_price=1000")
+        
+        if success and isinstance(response.get("results"), list) and "facets" in response:
+            over_budget = [product for product in response["results"] if product.get("price", 0) > 1000]
+            if over_budget:
+                self.log_result("Products - Search", False, f"{len(over_budget)} results ignore the max_price filter")
+                return False
+            self.log_result("Products - Search", True, f"{response['total']} matches, facets: {', '.join(response['facets'])}")
+            return True
+        else:
+            self.log_result("Products - Search", False, f"Status: {status_code}, Response: {response}")
+            return False
+
     # ==================== BRAND TESTS (HIGH) ====================
     
     def test_brands_list(self):
@@ -298,7 +344,7 @@ class SkyratingAPITester:
             "name": "Test Brand",
             "description": "A test brand for API testing",
             "category": "fashion",
-            "logo": "data:image/jpeg;base64,/9j/4AAQSkZJRgABAQEAYABgAAD/2wBDAAEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQH/2wBDAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQH/wAARCAABAAEDASIAAhEBAxEB/8QAFQABAQAAAAAAAAAAAAAAAAAAAAv/xAAUEAEAAAAAAAAAAAAAAAAAAAAA/8QAFQEBAQAAAAAAAAAAAAAAAAAAAAX/xAAUEQEAAAAAAAAAAAAAAAAAAAAA/9oADAMBAAIRAxEAPwA/8A"
+            "logo": TEST_IMAGE
         }
         
         success, response, status_code = self.make_request("POST", "/brands", data, token=self.admin_token)
@@ -347,6 +393,30 @@ class SkyratingAPITester:
             self.log_result("Users - Update Profile", False, f"Status: {status_code}, Response: {response}")
             return False
 
+    def test_users_follow(self):
+        """Test following a user and reading both sides of the edge"""
+        if not self.user_token or not self.test_user_id or not self.admin_user_id:
+            self.log_result("Users - Follow", False, "No user token or user IDs available")
+            return False
+
+        success, response, status_code = self.make_request("POST", f"/users/follow/{self.admin_user_id}", token=self.user_token)
+        if not success:
+            self.log_result("Users - Follow", False, f"Status: {status_code}, Response: {response}")
+            return False
+
+        _, followers, _ = self.make_request("GET", f"/users/{self.admin_user_id}/followers?limit=100")
+        success, following, status_code = self.make_request("GET", f"/users/{self.test_user_id}/following")
+
+        if not success or not isinstance(followers, list) or not isinstance(following, list):
+            self.log_result("Users - Follow", False, f"Status: {status_code}, Followers: {followers}, Following: {following}")
+            return False
+        if self.test_user_id in [user["id"] for user in followers] and self.admin_user_id in [user["id"] for user in following]:
+            self.log_result("Users - Follow", True, f"Follow edge listed in followers ({len(followers)}) and following ({len(following)})")
+            return True
+        else:
+            self.log_result("Users - Follow", False, "Follow edge missing from followers or following")
+            return False
+
     # ==================== ORDER TESTS (HIGH) ====================
     
     def test_orders_create(self):
@@ -514,7 +584,7 @@ class SkyratingAPITester:
         
         data = {
             "content": "Test post from unverified user",
-            "media": ["data:image/jpeg;base64,/9j/4AAQSkZJRgABAQEAYABgAAD/2wBDAAEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQH/2wBDAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQH/wAARCAABAAEDASIAAhEBAxEB/8QAFQABAQAAAAAAAAAAAAAAAAAAAAv/xAAUEAEAAAAAAAAAAAAAAAAAAAAA/8QAFQEBAQAAAAAAAAAAAAAAAAAAAAX/xAAUEQEAAAAAAAAAAAAAAAAAAAAA/9oADAMBAAIRAxEAPwA/8A"],
+            "media": [TEST_IMAGE],
             "tagged_products": []
         }
         
@@ -560,6 +630,71 @@ class SkyratingAPITester:
             self.log_result("Posts - Comment", False, f"Status: {status_code}, Response: {response}")
             return False
 
+    def test_posts_following_feed(self):
+        """Test that a new post shows up in its author's following feed"""
+        if not self.user_token or not self.test_post_id:
+            self.log_result("Posts - Following Feed", False, "No user token or post ID available")
+            return False
+
+        success, response, status_code = self.make_request("GET", "/posts/feed/following", token=self.user_token)
+
+        if success and isinstance(response, list) and self.test_post_id in [post["_id"] for post in response]:
+            self.log_result("Posts - Following Feed", True, f"Retrieved {len(response)} posts including the new one")
+            return True
+        else:
+            self.log_result("Posts - Following Feed", False, f"Status: {status_code}, Response: {response}")
+            return False
+
+    def test_posts_like_count(self):
+        """Test that liking twice moves likes_count up and back down"""
+        if not self.user_token or not self.test_post_id:
+            self.log_result("Posts - Like Count", False, "No user token or post ID available")
+            return False
+
+        _, liked, _ = self.make_request("POST", f"/posts/{self.test_post_id}/like", token=self.user_token)
+        success, unliked, status_code = self.make_request("POST", f"/posts/{self.test_post_id}/like", token=self.user_token)
+
+        if not success or "likes_count" not in liked or "likes_count" not in unliked:
+            self.log_result("Posts - Like Count", False, f"Status: {status_code}, Response: {unliked}")
+            return False
+        if liked["liked"] and not unliked["liked"] and unliked["likes_count"] == liked["likes_count"] - 1:
+            self.log_result("Posts - Like Count", True, f"likes_count went {liked['likes_count']} -> {unliked['likes_count']}")
+            return True
+        else:
+            self.log_result("Posts - Like Count", False, f"Like: {liked}, Unlike: {unliked}")
+            return False
+
+    def test_posts_comments_pagination(self):
+        """Test paging through a post's comments via the X-Next-Cursor header"""
+        if not self.user_token or not self.test_post_id:
+            self.log_result("Posts - Comments Pagination", False, "No user token or post ID available")
+            return False
+
+        try:
+            for i in range(3):
+                self.make_request("POST", f"/posts/{self.test_post_id}/comment", {"content": f"Paging comment {i}"}, token=self.user_token)
+
+            url = f"{self.base_url}/posts/{self.test_post_id}/comments"
+            first = requests.get(url, params={"limit": 2}, timeout=30)
+            next_cursor = first.headers.get("X-Next-Cursor")
+            if first.status_code != 200 or len(first.json()) != 2 or not next_cursor:
+                self.log_result("Posts - Comments Pagination", False, f"Status: {first.status_code}, Cursor: {next_cursor}, Response: {first.text}")
+                return False
+
+            second = requests.get(url, params={"limit": 2, "cursor": next_cursor}, timeout=30)
+            first_ids = {comment["_id"] for comment in first.json()}
+            second_ids = {comment["_id"] for comment in second.json()}
+
+            if second.status_code == 200 and second_ids and not first_ids & second_ids:
+                self.log_result("Posts - Comments Pagination", True, f"Page 2 returned {len(second_ids)} new comments")
+                return True
+            else:
+                self.log_result("Posts - Comments Pagination", False, f"Status: {second.status_code}, overlapping or empty pages")
+                return False
+        except Exception as e:
+            self.log_result("Posts - Comments Pagination", False, f"Request failed: {str(e)}")
+            return False
+
     # ==================== ADMIN TESTS (MEDIUM) ====================
     
     def test_admin_analytics(self):
@@ -822,14 +957,30 @@ class SkyratingAPITester:
         success, response, status_code = self.make_request("POST", "/admin/notifications/send", notification_data, token=self.admin_token)
         
         if success and "message" in response:
-            sent_count = response.get("sent_count", 0)
+            self.test_notification_job_id = response.get("job_id")
             self.log_result("Push Notifications - Send", True, 
-                          f"Notification sent successfully to {sent_count} users")
+                          f"{response['message']} ({response.get('total_count', 0)} recipients)")
             return True
         else:
             self.log_result("Push Notifications - Send", False, f"Status: {status_code}, Response: {response}")
             return False
 
+    def test_push_notifications_job_status(self):
+        """Test GET /api/admin/notifications/jobs/{job_id}"""
+        if not self.admin_token or not self.test_notification_job_id:
+            self.log_result("Push Notifications - Job Status", False, "No admin token or job ID available")
+            return False
+        
+        success, response, status_code = self.make_request("GET", f"/admin/notifications/jobs/{self.test_notification_job_id}", token=self.admin_token)
+        
+        if success and all(field in response for field in ["status", "sent", "failed", "remaining"]):
+            self.log_result("Push Notifications - Job Status", True, 
+                          f"Job {response['status']}: {response['sent']} sent, {response['failed']} failed, {response['remaining']} remaining")
+            return True
+        else:
+            self.log_result("Push Notifications - Job Status", False, f"Status: {status_code}, Response: {response}")
+            return False
+
     # ==================== NEW FEATURES TESTS (PRODUCTION) ====================
     
     def test_razorpay_payment_integration(self):
@@ -893,8 +1044,24 @@ class SkyratingAPITester:
             
             if response.status_code == 200:
                 result = response.json()
-                if result.get("success") and "image" in result and result["image"].startswith("data:image"):
-                    self.log_result("Image Upload", True, "Image uploaded and base64 encoded successfully")
+                if result.get("success") and "image" in result and "/api/media/" in result["image"]:
+                    media = requests.get(result["image"], timeout=30)
+                    if media.status_code != 200 or media.content != test_image_data:
+                        self.log_result("Image Upload", False, f"Media URL returned {media.status_code}")
+                        return False
+                    if media.headers.get("content-type") != "image/png" or media.headers.get("x-content-type-options") != "nosniff":
+                        self.log_result("Image Upload", False, f"Media served as {media.headers.get('content-type')} without nosniff")
+                        return False
+
+                    # Anything that isn't really an image is refused before it is stored
+                    html = {'file': ('page.html', io.BytesIO(b"<script>alert(1)</script>"), 'text/html')}
+                    disguised = {'file': ('page.png', io.BytesIO(b"<script>alert(1)</script>"), 'image/png')}
+                    for rejected in (html, disguised):
+                        response = requests.post(url, headers=headers, files=rejected, timeout=30)
+                        if response.status_code != 415:
+                            self.log_result("Image Upload", False, f"Non-image upload returned {response.status_code}")
+                            return False
+                    self.log_result("Image Upload", True, f"Image stored and served from {result['image']}")
                     return True
                 else:
                     self.log_result("Image Upload", False, "Invalid response format")
@@ -1094,6 +1261,8 @@ class SkyratingAPITester:
         self.test_products_single()
         self.test_products_create_admin()
         self.test_products_create_user_forbidden()
+        self.test_products_cursor_pagination()
+        self.test_product_search()
         print()
 
         # HIGH PRIORITY - Brand APIs
@@ -1109,6 +1278,7 @@ class SkyratingAPITester:
         print("-" * 30)
         self.test_users_get_profile()
         self.test_users_update_profile()
+        self.test_users_follow()
         print()
 
         # HIGH PRIORITY - Order APIs
@@ -1134,8 +1304,11 @@ class SkyratingAPITester:
         print("-" * 30)
         self.test_posts_feed()
         self.test_posts_create_unverified()
+        self.test_posts_following_feed()
+        self.test_posts_like_count()
         self.test_posts_like()
         self.test_posts_comment()
+        self.test_posts_comments_pagination()
         print()
 
         # MEDIUM PRIORITY - Admin APIs
@@ -1158,6 +1331,7 @@ class SkyratingAPITester:
         self.test_push_notifications_register_token()
         self.test_push_notifications_stats()
         self.test_push_notifications_send()
+        self.test_push_notifications_job_status()
         print()
 
         # NEW FEATURES TESTS (PRODUCTION)
@@ -17,6 +17,7 @@ import { Stack, useRouter } from 'expo-router';
 import AsyncStorage from '@react-native-async-storage/async-storage';
 import * as ImagePicker from 'expo-image-picker';
 import axios from 'axios';
+import { uploadImage } from '../../utils/upload';
 
 const API_URL = process.env.EXPO_PUBLIC_BACKEND_URL;
 
@@ -51,7 +52,7 @@ export default function AdminBrandsScreen() {
 
   const loadBrands = async () => {
     try {
-      const response = await axios.get(`${API_URL}/api/brands?status=all`);
+      const response = await axios.get(`${API_URL}/api/brands?status=all&fields=all`);
       setBrands(response.data);
     } catch (error) {
       console.error('Error loading brands:', error);
@@ -74,15 +75,15 @@ export default function AdminBrandsScreen() {
         allowsEditing: true,
         aspect: type === 'logo' ? [1, 1] : [16, 9],
         quality: 0.5,
-        base64: true,
       });
 
-      if (!result.canceled && result.assets[0].base64) {
-        const base64Image = `data:image/jpeg;base64,${result.assets[0].base64}`;
+      if (!result.canceled) {
+        // Uploaded to the media store when the brand is saved
+        const uri = result.assets[0].uri;
         if (type === 'logo') {
-          setLogo(base64Image);
+          setLogo(uri);
         } else {
-          setBanner(base64Image);
+          setBanner(uri);
         }
       }
     } catch (error) {
@@ -104,8 +105,8 @@ export default function AdminBrandsScreen() {
         name,
         description,
         category,
-        logo: logo || undefined,
-        banner: banner || undefined,
+        logo: logo ? await uploadImage(logo, token) : undefined,
+        banner: banner ? await uploadImage(banner, token) : undefined,
       };
 
       if (editingBrand) {
@@ -73,7 +73,9 @@ export default function AdminNotificationsScreen() {
 
               Alert.alert(
                 'Success',
-                `Notification sent to ${response.data.sent_count} users`
+                response.data.job_id
+                  ? `Notification queued for ${response.data.total_count} users`
+                  : response.data.message
               );
               setTitle('');
               setBody('');
@@ -18,6 +18,7 @@ import { Stack, useRouter } from 'expo-router';
 import AsyncStorage from '@react-native-async-storage/async-storage';
 import * as ImagePicker from 'expo-image-picker';
 import axios from 'axios';
+import { uploadImage } from '../../utils/upload';
 
 const { width } = Dimensions.get('window');
 const API_URL = process.env.EXPO_PUBLIC_BACKEND_URL;
@@ -50,7 +51,7 @@ export default function AdminProductsScreen() {
   const loadData = async () => {
     try {
       const [productsRes, brandsRes] = await Promise.all([
-        axios.get(`${API_URL}/api/products?limit=100`),
+        axios.get(`${API_URL}/api/products?limit=100&fields=all`),
         axios.get(`${API_URL}/api/brands`)
       ]);
       setProducts(productsRes.data);
@@ -68,13 +69,11 @@ export default function AdminProductsScreen() {
         mediaTypes: ImagePicker.MediaTypeOptions.Images,
         allowsMultipleSelection: true,
         quality: 0.5,
-        base64: true,
       });
 
       if (!result.canceled) {
-        const newImages = result.assets.map(asset => 
-          `data:image/jpeg;base64,${asset.base64}`
-        );
+        // Uploaded to the media store when the product is saved
+        const newImages = result.assets.map(asset => asset.uri);
         setImages([...images, ...newImages]);
       }
     } catch (error) {
@@ -101,7 +100,7 @@ export default function AdminProductsScreen() {
         gender,
         sizes: sizes.split(',').map(s => s.trim()),
         colors: colors.split(',').map(c => c.trim()),
-        images: images,
+        images: await Promise.all(images.map(uri => uploadImage(uri, token))),
       };
 
       if (editingProduct) {
@@ -0,0 +1,35 @@
+import axios from 'axios';
+
+const API_URL = process.env.EXPO_PUBLIC_BACKEND_URL;
+
+const MIME_TYPES: Record<string, string> = {
+  png: 'image/png',
+  webp: 'image/webp',
+  gif: 'image/gif',
+};
+
+/**
+ * Upload a picked image to the media store and return its URL
+ * @param uri - Local file URI from the image picker; media URLs are returned unchanged
+ * @param token - Auth token of the signed-in user
+ * @returns URL of the stored image
+ */
+export const uploadImage = async (uri: string, token: string | null): Promise<string> => {
+  // Only files still on the device need uploading
+  if (!uri.startsWith('file:') && !uri.startsWith('content:')) {
+    return uri;
+  }
+
+  const name = uri.split('/').pop() || 'image.jpg';
+  const extension = name.split('.').pop()?.toLowerCase() || '';
+  const form = new FormData();
+  form.append('file', { uri, name, type: MIME_TYPES[extension] || 'image/jpeg' } as any);
+
+  const response = await axios.post(`${API_URL}/api/upload/image`, form, {
+    headers: {
+      Authorization: `Bearer ${token}`,
+      'Content-Type': 'multipart/form-data',
+    },
+  });
+  return response.data.image;
+};